@@ -1,16 +1,35 @@
 import os
 import re
-from fastapi import FastAPI, HTTPException, Depends, Header, status
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from itertools import islice
+from anyio import from_thread
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-
+try:
+    import orjson
+except ImportError:  # optional; FAST_RESPONSES falls back to the stdlib encoder
+    orjson = None
+import bulk
 import database
+import http_client
+import metrics
+import rates
+import series
 
 load_dotenv()
 
@@ -21,6 +40,11 @@ if not JWT_SECRET:
 
 JWT_ALGO = os.getenv("JWT_ALGO", "HS256")
 ACCESS_TOKEN_EXPIRES_MINUTES = 60 * 24 * 7
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Admin endpoints (e.g. /admin/slow-queries) exist only when this is set and
+# are called with an "X-Admin-Token: <ADMIN_TOKEN>" header.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 API_ALLOWED_ORIGINS = ["http://localhost:8501", "http://127.0.0.1:8501"]
 
@@ -31,7 +55,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Compress large bodies for clients that accept gzip. Responses that already
+# set Content-Encoding (e.g. /transactions/export?gzip=true) pass through.
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+# Added last so it is outermost and times compression too (see metrics.py)
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Opt-in fast responses for list endpoints: rows coming from our own database
+# are encoded directly (orjson when installed) instead of being validated
+# against the response model and re-encoded by jsonable_encoder.
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "0") == "1"
+
+MAX_PAGE_SIZE = 1000
+BULK_CHUNK_ROWS = 10_000
+BULK_MAX_ERRORS = 1000
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+# Currency codes only; they end up in the upstream URL path
+CURRENCY_PATTERN = r"^[A-Za-z]{3,5}$"
 
 class AuthPayload(BaseModel):
     username: str
@@ -41,13 +85,26 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-class TransactionIn(BaseModel):
+class TransactionBase(BaseModel):
     type: str
     category: Optional[str] = ""
     amount: float
     date: Optional[str] = None
 
-class TransactionOut(TransactionIn):
+class TransactionIn(TransactionBase):
+    # A real YYYY-MM-DD date: the month bucket and date ordering depend on it
+    date: Optional[str] = Field(None, pattern=DATE_PATTERN)
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: Optional[str]) -> Optional[str]:
+        # Same rule as bulk imports, so 2024-02-30 is refused on every write path
+        if value is not None and not bulk.is_valid_date(value):
+            raise ValueError("date must be a valid YYYY-MM-DD date")
+        return value
+
+# Not a TransactionIn: rows stored before dates were validated must still be listed
+class TransactionOut(TransactionBase):
     id: int
     username: str
 
@@ -60,6 +117,75 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGO)
     return encoded_jwt
 
+# Opaque page cursor: urlsafe base64 of the (date, id) of the last row served
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["date"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, tx_id = json.loads(raw)
+        return str(date), int(tx_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# JSON encoding for trusted database rows
+if FAST_RESPONSES and orjson is not None:
+    dumps = orjson.dumps
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+def fast_json(content, headers: Optional[dict] = None) -> Response:
+    return Response(content=dumps(content), media_type="application/json", headers=headers)
+
+# Streaming encoders: one chunk per database batch, rows never collected in memory
+def stream_json_array(batches):
+    yield b"["
+    sep = b""
+    for batch in batches:
+        yield sep + b",".join(dumps(dict(zip(database.TX_COLUMNS, row))) for row in batch)
+        sep = b","
+    yield b"]"
+
+def stream_changes(changes: dict):
+    """database.get_changes() as one JSON object, the upserts array streamed last."""
+    head = dumps({key: changes[key] for key in ("version", "reset", "deleted")})
+    yield head[:-1] + b',"upserts":'
+    yield from stream_json_array(changes["upserts"])
+    yield b"}"
+
+def stream_ndjson(batches):
+    for batch in batches:
+        yield b"".join(dumps(dict(zip(database.TX_COLUMNS, row))) + b"\n" for row in batch)
+
+# Validated tokens: sha256(token) -> (username, exp). Bounded LRU, so the
+# signature check and JSON parsing run once per token instead of per request.
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def _cached_token(digest: bytes) -> Optional[str]:
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry is None:
+            return None
+        username, exp = entry
+        if exp <= time.time():
+            del _token_cache[digest]
+            return None
+        _token_cache.move_to_end(digest)
+        return username
+
+def _cache_token(digest: bytes, username: str, exp: Optional[float]):
+    if not TOKEN_CACHE_SIZE or exp is None:
+        return
+    with _token_cache_lock:
+        _token_cache[digest] = (username, float(exp))
+        _token_cache.move_to_end(digest)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
 # UPDATED FUNCTION HERE
 def verify_token(auth_header: Optional[str] = Header(None, alias="Authorization")) -> str:
     if not auth_header:
@@ -71,17 +197,94 @@ def verify_token(auth_header: Optional[str] = Header(None, alias="Authorization"
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authorization header format")
     
     token = parts[1]
+    digest = hashlib.sha256(token.encode()).digest()
+    username = _cached_token(digest)
+    if username is not None:
+        return username
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+        _cache_token(digest, username, payload.get("exp"))
         return username
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalid or expired")
+
+def verify_admin(admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not admin_token or not hmac.compare_digest(admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+def wants_ndjson(request: Request) -> bool:
+    """format=ndjson, or no format and an Accept header asking for NDJSON."""
+    fmt = request.query_params.get("format")
+    if fmt is not None:
+        return fmt == "ndjson"
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+# Conditional GET: a weak ETag built from the user's data version (bumped by
+# every write in database.py), the request path + query and the negotiated
+# format, which together select what the body contains. A matching
+# If-None-Match is answered with 304.
+def data_etag(request: Request, response: Response, username: str = Depends(verify_token)) -> str:
+    return _check_etag(request, response, username)
+
+def _check_etag(request: Request, response: Response, username: str, implicit: str = "") -> str:
+    """`implicit`: anything else the body depends on that is not in the URL (e.g. today's month)."""
+    etag = _etag(request, username, implicit)
+    # The body can depend on Accept (see list_my_transactions)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if _not_modified(request, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return etag
+
+def _etag(request: Request, username: str, implicit: str = "") -> str:
+    version = database.get_data_version(username)
+    representation = "ndjson" if wants_ndjson(request) else "json"
+    digest = zlib.crc32(f"{request.url.path}?{request.url.query}#{representation}#{implicit}".encode())
+    return f'W/"{version}-{digest:08x}"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
 @app.on_event("startup")
-def startup():
-    database.init_db()
+async def startup():
+    if metrics.ENABLED:
+        database.add_query_hook(metrics.observe_sql)
+    await run_in_threadpool(database.init_db)
+    await run_in_threadpool(rates.service.load)
+    await http_client.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await http_client.close()
+    await run_in_threadpool(database.close_connections)
+    database.remove_query_hook(metrics.observe_sql)
+
+@app.get("/admin/slow-queries", dependencies=[Depends(verify_admin)])
+def get_slow_queries(clear: bool = False):
+    """Statements over the slow-query threshold (SLOW_QUERY_MS), newest first."""
+    return {
+        "threshold_ms": database.slow_query_threshold(),
+        "queries": database.slow_queries(clear=clear),
+    }
+
+@app.get("/admin/users", dependencies=[Depends(verify_admin)])
+def get_users():
+    """Every user with their transaction count and balance, merged across all shards."""
+    return {"shards": len(database.shard_paths()), "users": database.list_users()}
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of the counters in metrics.py."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # --- Auth ---
 @app.post("/auth/register", status_code=201)
@@ -109,19 +312,130 @@ def create_transaction(tx: TransactionIn, username: str = Depends(verify_token))
     }
     return out
 
+@app.post("/transactions/bulk")
+async def import_transactions(request: Request, format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+                              username: str = Depends(verify_token)):
+    """
+    Import a CSV (header: type,category,amount,date) or NDJSON upload sent as
+    the raw request body. The body is read as a stream and inserted in
+    chunks of BULK_CHUNK_ROWS records, each committed on its own; invalid
+    records are skipped and reported. The format comes from `format` or the
+    Content-Type.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("ndjson" if "json" in content_type else "csv")
+    try:
+        # Parsing and inserting run on one worker thread; the body is still read on the event loop
+        return await run_in_threadpool(_import_upload, username, fmt, _body_chunks(request))
+    except bulk.HeaderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _import_upload(username: str, fmt: str, chunks) -> dict:
+    lines = bulk.text_lines(chunks)
+    records = bulk.csv_records(lines) if fmt == "csv" else bulk.ndjson_records(lines)
+    inserted = failed = 0
+    errors = []
+    while True:
+        chunk = list(islice(records, BULK_CHUNK_ROWS))
+        if not chunk:
+            break
+        rows, chunk_errors = bulk.validate_records(chunk)
+        inserted += database.add_transactions_bulk(username, rows)
+        failed += len(chunk_errors)
+        errors.extend(chunk_errors[:BULK_MAX_ERRORS - len(errors)])
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+def _body_chunks(request: Request):
+    """The request body as a blocking iterator for a worker thread; each chunk is awaited on the event loop."""
+    stream = request.stream()
+
+    async def next_chunk():
+        return await stream.__anext__()
+
+    while True:
+        try:
+            yield from_thread.run(next_chunk)
+        except StopAsyncIteration:
+            return
+
+@app.get("/transactions/export")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    username: str = Depends(verify_token),
+):
+    """
+    Download the user's whole history as CSV or NDJSON. Rows are streamed
+    from the SQLite cursor in batches (chunked transfer, nothing buffered),
+    and each batch is produced on a worker thread so the event loop stays
+    free. `gzip=true` compresses the stream on the fly.
+    """
+    batches = database.iter_transactions(username, batch_size=2000)
+    if format == "csv":
+        chunks = bulk.csv_chunks(batches, database.TX_COLUMNS)
+        media_type = "text/csv"
+    else:
+        chunks = stream_ndjson(batches)
+        media_type = "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    if gzip:
+        chunks = bulk.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@app.get("/transactions/changes")
+def get_transaction_changes(since: int = Query(0, ge=0), username: str = Depends(verify_token)):
+    """
+    Delta sync: rows inserted or updated and ids deleted after change version
+    `since` (0 = everything). Pass the returned "version" as the next `since`;
+    on "reset" drop the local copy first. The rows are streamed from the
+    cursor, so a full snapshot costs no more memory than a small delta.
+    """
+    changes = database.get_changes(username, since, batch_size=2000)
+    return StreamingResponse(stream_changes(changes), media_type="application/json")
+
 @app.get("/transactions/me", response_model=List[TransactionOut])
-def list_my_transactions(username: str = Depends(verify_token)):
-    df = database.get_transactions(username)
-    if df is None or df.empty:
-        return []
-    rows = df.to_dict(orient="records")
-    out = []
-    for r in rows:
-        out.append({
-            "id": int(r["id"]), "username": r["username"], "type": r["type"], 
-            "category": r["category"], "amount": float(r["amount"]), "date": r["date"]
-        })
-    return out
+def list_my_transactions(
+    request: Request,
+    response: Response,
+    username: str = Depends(verify_token),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+):
+    """
+    Newest-first transactions. With `limit`, a full page sets the X-Next-Cursor
+    header; pass it back as `after` to get the next page. Without `limit` the
+    whole (filtered) history is streamed from the cursor as a JSON array, or as
+    NDJSON with `format=ndjson` / `Accept: application/x-ndjson`.
+    Conditional like data_etag, but a 304 for a page still carries its
+    X-Next-Cursor, which a client revalidating its cached page needs to go on.
+    """
+    filters = {"date_from": date_from, "date_to": date_to, "t_type": type, "category": category}
+    cursor = decode_cursor(after) if after else None
+    etag = _etag(request, username)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if limit is not None:
+        rows = database.get_transactions_page(username, limit=limit, after=cursor, **filters)
+        if len(rows) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+        if _not_modified(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        if FAST_RESPONSES:
+            return fast_json(rows, headers=dict(response.headers))
+        return rows
+
+    if _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    batches = database.iter_transactions(username, after=cursor, **filters)
+    if wants_ndjson(request):
+        return StreamingResponse(stream_ndjson(batches), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(stream_json_array(batches), media_type="application/json", headers=headers)
 
 @app.delete("/transactions/{tx_id}")
 def remove_transaction(tx_id: int, username: str = Depends(verify_token)):
@@ -153,52 +467,43 @@ def update_transaction_endpoint(tx_id: int, tx: TransactionIn, username: str = D
 
 
 @app.get("/scrape-currency")
-def scrape_currency(frm: str = "EUR", to: str = "USD"):
+async def scrape_currency(frm: str = Query("EUR", pattern=CURRENCY_PATTERN), to: str = Query("USD", pattern=CURRENCY_PATTERN)):
     """
-    Scrapes exchange rate from Yahoo Finance.
-    Allowed: finance.yahoo.com
+    Exchange rate from Yahoo Finance, served through the rate cache (see rates.py).
+    Allowed: finance.yahoo.com (or the configured RATES_UPSTREAM)
     """
-    allowed_domains = ["finance.yahoo.com"]
-    target_url = f"https://finance.yahoo.com/quote/{frm}{to}=X"
-    
-    # Basic SSRF Protection
-    if not any(d in target_url for d in allowed_domains):
-        raise HTTPException(status_code=400, detail="Domain not allowed")
-
+    frm, to = frm.upper(), to.upper()
     try:
-        # Headers to mimic a real browser slightly better
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        res = requests.get(target_url, headers=headers, timeout=10)
-        res.raise_for_status()
-        
-        soup = BeautifulSoup(res.text, "html.parser")
-        # Yahoo Finance usually puts the rate in a <fin-streamer> tag or a specific span
-        # This selector often works for the main rate
-        rate_tag = soup.find("fin-streamer", {"data-field": "regularMarketPrice"})
-        
-        if rate_tag:
-            return {"source": "Yahoo Finance", "from": frm, "to": to, "rate": float(rate_tag.text.replace(",",""))}
-        else:
-            # Fallback logic if tags change
-            return {"source": "Yahoo Finance (Fallback)", "from": frm, "to": to, "rate": 1.0, "note": "Could not parse specific rate tag"}
-            
+        cached = await rates.service.get(frm, to)
+    except rates.RateNotFound as e:
+        # Fallback logic if tags change
+        return {"source": "Yahoo Finance (Fallback)", "from": frm, "to": to, "rate": 1.0, "note": str(e)}
     except Exception as e:
         # Fallback so the app doesn't crash during presentation if scraping fails
         return {"source": "Mock Data", "from": frm, "to": to, "rate": 1.1, "note": "Scraping failed, using mock rate"}
+    out = {"source": "Yahoo Finance", "from": frm, "to": to, "rate": cached["rate"],
+           "as_of": datetime.utcfromtimestamp(cached["fetched_at"]).isoformat(timespec="seconds") + "Z"}
+    if cached["stale"]:
+        out["note"] = "Cached rate, refresh in progress"
+    return out
 
-@app.get("/ai-tips")
-def get_ai_tips(username: str = Depends(verify_token)):
+@app.get("/rates")
+async def get_rates(base: str = Query("USD", pattern=CURRENCY_PATTERN),
+              symbols: Optional[str] = Query(None, pattern=r"^[A-Za-z]{3,5}(,[A-Za-z]{3,5})*$")):
     """
-    Analyzes user data and returns tips.
+    Units of every symbol per 1 `base` (default: all converter currencies).
+    Each currency is quoted once against the pivot and all cross rates are
+    derived locally, so one call prices every pair: frm->to = rates[to] / rates[frm].
     """
-    df = database.get_transactions(username)
-    if df is None or df.empty:
-        return {"tips": ["Add some transactions to get personalized advice!"]}
-    
-    income = df[df["type"] == "income"]["amount"].sum()
-    expense = df[df["type"] == "expense"]["amount"].sum()
+    wanted = tuple(s.upper() for s in symbols.split(",")) if symbols else rates.CURRENCIES
+    out = await rates.rates_for(base.upper(), wanted)
+    if out["as_of"] is not None:
+        out["as_of"] = datetime.utcfromtimestamp(out["as_of"]).isoformat(timespec="seconds") + "Z"
+    return out
+
+def build_tips(income: float, expense: float, count: int, top_category: Optional[str]) -> list:
+    if not count:
+        return ["Add some transactions to get personalized advice!"]
     
     tips = []
     if income == 0:
@@ -218,19 +523,89 @@ def get_ai_tips(username: str = Depends(verify_token)):
         tips.append("🚨 Alert: You are spending more than you earn!")
         
     # Find most expensive category
-    expenses = df[df["type"] == "expense"]
-    if not expenses.empty:
-        top_cat = expenses.groupby("category")["amount"].sum().idxmax()
-        tips.append(f"💡 Your biggest expense is '{top_cat}'. Check if you can reduce this.")
+    if top_category is not None:
+        tips.append(f"💡 Your biggest expense is '{top_category}'. Check if you can reduce this.")
         
-    return {"tips": tips}
+    return tips
+
+@app.get("/ai-tips", dependencies=[Depends(data_etag)])
+def get_ai_tips(username: str = Depends(verify_token)):
+    """
+    Analyzes user data and returns tips. Reads the running per-category
+    totals in user_stats, so the cost depends on the number of categories,
+    not transactions.
+    """
+    stats = database.get_user_stats(username)
+    expenses = [c for c in stats["categories"] if c["type"] == "expense"]
+    top_category = max(expenses, key=lambda c: c["total"])["category"] if expenses else None
+    return {"tips": build_tips(stats["income"], stats["expense"], stats["count"], top_category)}
+
+@app.get("/me/summary", dependencies=[Depends(data_etag)])
+def get_summary(username: str = Depends(verify_token)):
+    """Income/expense totals plus per-category and per-month sums, from the rollup table."""
+    return database.get_summary(username)
+
+def dashboard_month(month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$")) -> str:
+    return month or datetime.today().strftime("%Y-%m")
+
+# Without ?month= the body depends on today's date, so the resolved month
+# is part of the ETag: last month's dashboard is not revalidated as current
+def dashboard_etag(request: Request, response: Response, anchor: str = Depends(dashboard_month),
+                   username: str = Depends(verify_token)) -> str:
+    return _check_etag(request, response, username, anchor)
+
+@app.get("/me/dashboard", dependencies=[Depends(dashboard_etag)])
+def get_dashboard(
+    period: str = Query("month", pattern="^(month|year|all)$"),
+    anchor: str = Depends(dashboard_month),
+    username: str = Depends(verify_token),
+):
+    """
+    One response per dashboard page: goal, totals and categories for the
+    period containing `month` (YYYY-MM, default this month), all-time
+    totals, monthly series and tips, from one read of the rollup table.
+    """
+    year, mon = int(anchor[:4]), int(anchor[5:])
+    if period == "month":
+        first = last = year * 100 + mon
+        # The trailing year, for context around a single month
+        series_from = (year - 1) * 100 + mon + 1 if mon < 12 else year * 100 + 1
+        label = anchor
+    elif period == "year":
+        first, last = year * 100 + 1, year * 100 + 12
+        series_from = first
+        label = str(year)
+    else:
+        first, last = 0, 999912
+        series_from = 0
+        label = "all"
+    dash = database.get_dashboard(username, first, last, series_from)
+    # Tips follow the period, or the whole history while the period is empty
+    basis = dash["totals"] if dash["totals"]["count"] else dash["all_time"]
+    dash["tips"] = build_tips(basis["income"], basis["expense"], basis["count"], basis["top_expense_category"])
+    dash["period"] = {"name": period, "label": label}
+    if dash["goal"] is None:
+        dash["goal"] = 1000.0
+    return dash
+
+@app.get("/me/series", dependencies=[Depends(data_etag)])
+def get_series(
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    points: int = Query(500, ge=3, le=5000),
+    username: str = Depends(verify_token),
+):
+    """
+    Running balance, income and expense per day, week or month, each line
+    downsampled server-side (LTTB) to at most `points` points.
+    """
+    return series.build(username, bucket, points)
 
 class GoalPayload(BaseModel):
     amount: float
 
 
 
-@app.get("/me/goal")
+@app.get("/me/goal", dependencies=[Depends(data_etag)])
 def get_goal(username: str = Depends(verify_token)):
     goal = database.get_user_goal(username)
     return {"goal": goal if goal is not None else 1000.0}
@@ -0,0 +1,107 @@
+"""
+Synchronous clients for calling the finance API from web.py (and bench.py).
+
+- http: a requests.Session with pooled keep-alive connections. Idempotent
+  calls (GET, PUT, DELETE) are retried with backoff on connection errors and
+  502/503/504; POSTs only when the request never reached the server.
+- inprocess: the FastAPI app itself, driven over ASGI on a background event
+  loop. Requests skip the socket and the HTTP parser but still go through
+  the middleware, routing and the same Authorization checks, so switching
+  transports changes no behaviour. The app's startup and shutdown hooks run
+  in this process, which must therefore see the API's settings
+  (DATABASE_PATH, JWT_SECRET).
+
+Both return response objects with status_code, headers, json(), text and
+raise_for_status(), and take requests-style keyword arguments (params, json,
+data, headers, timeout).
+"""
+import asyncio
+import atexit
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TRANSPORTS = ("http", "inprocess")
+
+
+def http_session(retries: int = 2, pool_size: int = 20) -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class InProcessSession:
+    """
+    api.app driven by an httpx.AsyncClient over httpx.ASGITransport, on an
+    event loop thread of its own. The app's startup hooks run here before
+    the first request and its shutdown hooks on close() (or at interpreter
+    exit). Calls from any thread are handed to that loop and wait for the
+    response; an unhandled error in the app comes back as a 500, as over HTTP.
+    """
+    def __init__(self, base_url: str = "http://finance.inprocess"):
+        # Imported here: the http transport must not load the API and its database
+        import api
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="finance-inprocess", daemon=True)
+        self._thread.start()
+        self._lifespan = api.app.router.lifespan_context(api.app)
+        try:
+            self._run(self._lifespan.__aenter__())
+        except BaseException:
+            self._stop_loop()
+            raise
+        transport = httpx.ASGITransport(app=api.app, raise_app_exceptions=False)
+        self.client = httpx.AsyncClient(transport=transport, base_url=base_url)
+        self._closed = False
+        atexit.register(self.close)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def request(self, method: str, url: str, data=None, timeout=None, **kwargs) -> httpx.Response:
+        # No socket to time out: the call runs the handler to completion
+        if isinstance(data, (bytes, str)):
+            kwargs["content"] = data  # requests takes a raw body as data=
+        elif data is not None:
+            kwargs["data"] = data
+        return self._run(self.client.request(method, url, **kwargs))
+
+    def close(self):
+        """Run the app's shutdown hooks and stop the loop thread."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        async def shutdown():
+            await self.client.aclose()
+            await self._lifespan.__aexit__(None, None, None)
+
+        try:
+            self._run(shutdown())
+        finally:
+            self._stop_loop()
+
+def session(transport: str, retries: int = 2, pool_size: int = 20):
+    if transport == "inprocess":
+        return InProcessSession()
+    if transport == "http":
+        return http_session(retries, pool_size)
+    raise ValueError(f"unknown transport {transport!r}, expected one of {', '.join(TRANSPORTS)}")
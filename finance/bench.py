@@ -0,0 +1,547 @@
+"""
+Benchmarks for the finance API.
+
+Benchmarks that need the API start their own uvicorn server on a throwaway
+database, so the real data/finance.db is never touched.
+
+    python bench.py pool --seconds 10 --concurrency 8
+    python bench.py plans
+    python bench.py listing --rows 500000
+    python bench.py import --rows 1000000
+    python bench.py auth
+    python bench.py rates --concurrency 32
+    python bench.py rates-load --seconds 5
+    python bench.py stats --rows 200000
+    python bench.py responses
+    python bench.py writers --seconds 3
+    python bench.py transport --rows 2000
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- Helpers ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextmanager
+def serve(env: dict = None, db_path: str = None):
+    """Run api:app under uvicorn on a temporary database and yield its base URL."""
+    tmp = tempfile.TemporaryDirectory()
+    port = _free_port()
+    proc_env = dict(os.environ)
+    proc_env.setdefault("JWT_SECRET", "bench-secret")
+    proc_env["DATABASE_PATH"] = db_path or os.path.join(tmp.name, "finance.db")
+    proc_env.update(env or {})
+    # Schema first, with the server's settings: a benchmark must not depend on
+    # (or time) the API's startup hook creating the tables
+    subprocess.run([sys.executable, "-c", "import database; database.init_db()"],
+                   cwd=BASE_DIR, env=proc_env, check=True)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR, env=proc_env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base}/docs", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("API did not start")
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait()
+        tmp.cleanup()
+
+class StubYahoo:
+    """
+    Local stand-in for finance.yahoo.com: serves /quote/<FROM><TO>=X pages with
+    a deterministic rate after `delay` seconds and counts the hits.
+    Point the API at it with RATES_UPSTREAM=stub.url.
+    """
+    def __init__(self, delay: float = 0.0):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        stub = self
+        self.hits = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real upstream
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                time.sleep(stub.delay)
+                symbol = self.path.rsplit("/", 1)[-1].replace("=X", "")
+                rate = 1 + (sum(map(ord, symbol)) % 997) / 1000
+                body = f'<html><fin-streamer data-field="regularMarketPrice">{rate:.4f}</fin-streamer></html>'.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def login(base: str, username: str, password: str = "pw") -> dict:
+    requests.post(f"{base}/auth/register", json={"username": username, "password": password}, timeout=10)
+    r = requests.post(f"{base}/auth/login", json={"username": username, "password": password}, timeout=10)
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+def run_concurrent(fn, concurrency: int, seconds: float):
+    """Call fn(session, worker_index) from `concurrency` threads for `seconds`; return (calls, errors)."""
+    stop = time.perf_counter() + seconds
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+
+    def worker(i):
+        with requests.Session() as s:
+            while time.perf_counter() < stop:
+                try:
+                    ok = fn(s, i)
+                except requests.RequestException:
+                    ok = False
+                counts[i] += 1
+                if not ok:
+                    errors[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts), sum(errors)
+
+
+# --- Benchmarks ---
+def bench_pool(args):
+    """Requests/sec on POST /transactions and GET /transactions/me, per-call connections vs pooled WAL."""
+    for label, env in (("per-call connect", {"DB_POOL": "0"}), ("pooled + WAL", {"DB_POOL": "1"})):
+        with serve(env) as base:
+            headers = [login(base, f"bench{i}") for i in range(args.concurrency)]
+
+            def post(s, i):
+                r = s.post(f"{base}/transactions", headers=headers[i], timeout=30,
+                           json={"type": "expense", "category": "Food", "amount": 12.5, "date": "2024-05-01"})
+                return r.status_code == 200
+
+            def get(s, i):
+                return s.get(f"{base}/transactions/me", headers=headers[i], timeout=30).status_code == 200
+
+            for name, fn in (("POST /transactions", post), ("GET /transactions/me", get)):
+                calls, errors = run_concurrent(fn, args.concurrency, args.seconds)
+                print(f"{label:18} {name:22} {calls / args.seconds:8.1f} req/s  errors={errors}")
+
+
+# Hot queries and the index each one must use. Checked by `bench.py plans`.
+HOT_QUERIES = [
+    ("SELECT id, username, type, category, amount, date FROM transactions "
+     "WHERE username = ? ORDER BY date DESC, id DESC", ("bench",), "ix_transactions_user_date"),
+    ("SELECT type, category, SUM(amount) FROM transactions "
+     "WHERE username = ? AND month BETWEEN ? AND ? GROUP BY type, category", ("bench", 202401, 202412),
+     "ix_transactions_user_month"),
+    ("SELECT id, username, type, category, amount, date FROM transactions WHERE username = ? AND version > ?",
+     ("bench", 100), "ix_transactions_user_version"),
+    ("SELECT id FROM tx_tombstones WHERE username = ? AND version > ?", ("bench", 100), "ix_tx_tombstones_user_version"),
+    ("SELECT date, SUM(CASE type WHEN 'income' THEN amount ELSE 0 END), "
+     "SUM(CASE type WHEN 'expense' THEN amount ELSE 0 END) "
+     "FROM transactions WHERE username = ? GROUP BY date ORDER BY date", ("bench",), "ix_transactions_user_date"),
+]
+
+def check_plans() -> list:
+    """
+    (ok, index, plan steps) for every hot query on the current database: ok
+    when the query is served by its index and needs no temp sort. Fills in
+    sample rows and ANALYZE statistics first, so run it on a scratch database.
+    """
+    import database
+    # Give the planner statistics resembling a real database
+    for i in range(200):
+        database.add_transaction(f"user{i % 20}", "expense", "Food", 10, f"2024-{i % 12 + 1:02d}-01")
+    with database._db(write=True) as conn:
+        conn.execute("ANALYZE")
+    results = []
+    for sql, params, index in HOT_QUERIES:
+        plan = database.explain(sql, params)
+        ok = any(index in step for step in plan) and not any("TEMP B-TREE FOR ORDER BY" in step for step in plan)
+        results.append((ok, index, plan))
+    return results
+
+def bench_plans(args):
+    """Assert that every hot query is served by its index and needs no temp sort (see tests/test_query_plans.py)."""
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "finance.db")
+    import database
+    database.init_db()
+    results = check_plans()
+    for ok, index, plan in results:
+        print(f"{'ok ' if ok else 'BAD'} {index}: {' | '.join(plan)}")
+    if not all(ok for ok, _, _ in results):
+        sys.exit(1)
+
+def fill_transactions(db_path: str, username: str, n: int):
+    """Migrate a database at `db_path` and bulk-insert `n` transactions for `username`."""
+    os.environ["DATABASE_PATH"] = db_path
+    import database
+    database.DB_PATH = db_path
+    database.init_db()
+    rows = (
+        (username, "expense" if i % 3 else "income", f"cat{i % 12}", float(i % 500), f"20{10 + i % 15}-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+        for i in range(n)
+    )
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO transactions (username, type, category, amount, date, month) "
+            "VALUES (?, ?, ?, ?, ?, CAST(substr(?5, 1, 4) AS INTEGER) * 100 + CAST(substr(?5, 6, 2) AS INTEGER))",
+            rows,
+        )
+    conn.close()
+
+def _listing_worker(mode: str, db_path: str, queue):
+    """Serialize the whole history in a fresh interpreter and report (seconds, peak RSS MB, bytes)."""
+    import resource
+    os.environ["DATABASE_PATH"] = db_path
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    sys.path.insert(0, BASE_DIR)
+    import json
+    import api
+    import database
+    if mode == "pandas":
+        import pandas as pd
+    start = time.perf_counter()
+    size = 0
+    if mode == "pandas":
+        # The previous path: DataFrame -> records -> per-row dict copies -> one JSON body
+        conn = sqlite3.connect(db_path)
+        df = pd.read_sql_query(
+            "SELECT * FROM transactions WHERE username = ? ORDER BY date DESC, id DESC", conn, params=("bench",)
+        )
+        conn.close()
+        out = [
+            {"id": int(r["id"]), "username": r["username"], "type": r["type"], "category": r["category"],
+             "amount": float(r["amount"]), "date": r["date"]}
+            for r in df.to_dict(orient="records")
+        ]
+        size = len(json.dumps(out))
+    else:
+        for chunk in api.stream_json_array(database.iter_transactions("bench")):
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, size))
+
+def bench_listing(args):
+    """Peak RSS and latency of serializing a large history: pandas path vs streaming cursor."""
+    import multiprocessing
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "finance.db")
+        fill_transactions(db_path, "bench", args.rows)
+        for mode in ("pandas", "stream"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_listing_worker, args=(mode, db_path, queue))
+            proc.start()
+            elapsed, rss_mb, size = queue.get()
+            proc.join()
+            print(f"{mode:7} rows={args.rows} {elapsed * 1000:9.1f} ms  peak RSS {rss_mb:7.1f} MB  body {size / 1e6:.1f} MB")
+
+def bench_import(args):
+    """Time POST /transactions/bulk for a generated CSV of --rows rows, streamed as the request body."""
+    with serve() as base:
+        headers = login(base, "bench")
+
+        def body():
+            yield b"type,category,amount,date\n"
+            for start in range(0, args.rows, 10_000):
+                yield "".join(
+                    f"{'income' if i % 10 == 0 else 'expense'},cat{i % 12},{i % 500}.25,20{10 + i % 15}-{i % 12 + 1:02d}-{i % 28 + 1:02d}\n"
+                    for i in range(start, min(start + 10_000, args.rows))
+                ).encode()
+
+        start = time.perf_counter()
+        r = requests.post(f"{base}/transactions/bulk", data=body(), timeout=3600,
+                          headers={**headers, "Content-Type": "text/csv"})
+        elapsed = time.perf_counter() - start
+        result = r.json()
+        print(f"imported {result['inserted']} rows ({result['failed']} failed) in {elapsed:.1f} s "
+              f"= {result['inserted'] / elapsed:,.0f} rows/s")
+
+def bench_auth(args):
+    """Per-request cost of verify_token with and without the decoded-token cache."""
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    import api
+    header = "Bearer " + api.create_access_token({"sub": "bench"})
+    n = 20_000
+    for label, size in (("no cache", 0), ("cached", 4096)):
+        api.TOKEN_CACHE_SIZE = size
+        api._token_cache.clear()
+        start = time.perf_counter()
+        for _ in range(n):
+            api.verify_token(header)
+        print(f"{label:9} {(time.perf_counter() - start) / n * 1e6:8.2f} us per request")
+
+def bench_rates(args):
+    """Concurrent /scrape-currency calls for one pair against a slow stub upstream: cold, then cached."""
+    from concurrent.futures import ThreadPoolExecutor
+    with StubYahoo(delay=0.5) as stub, serve({"RATES_UPSTREAM": stub.url}) as base:
+        def convert(_):
+            start = time.perf_counter()
+            r = requests.get(f"{base}/scrape-currency", params={"frm": "EUR", "to": "USD"}, timeout=30)
+            r.raise_for_status()
+            return time.perf_counter() - start
+        for label in ("cold", "cached"):
+            stub.hits = 0
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                latencies = sorted(pool.map(convert, range(args.concurrency)))
+            print(f"{label:6} {args.concurrency} concurrent requests: upstream hits={stub.hits} "
+                  f"median={latencies[len(latencies) // 2] * 1000:.1f} ms max={latencies[-1] * 1000:.1f} ms")
+
+def bench_rates_load(args):
+    """
+    Converter throughput vs concurrency with caching disabled, so every request
+    goes upstream (stub with 50 ms latency). Distinct pairs defeat single-flight.
+    """
+    import itertools
+    import random
+    codes = ["".join(c) for c in itertools.product("ABCDEFGH", repeat=3)]
+    env = {"RATES_UPSTREAM": "", "RATE_TTL_SECONDS": "0", "RATE_STALE_SECONDS": "0"}
+    with StubYahoo(delay=0.05) as stub:
+        env["RATES_UPSTREAM"] = stub.url
+        with serve(env) as base:
+            for concurrency in (1, 8, 32, 128):
+                def convert(s, i):
+                    frm, to = random.sample(codes, 2)
+                    return s.get(f"{base}/scrape-currency", params={"frm": frm, "to": to}, timeout=30).status_code == 200
+                stub.hits = 0
+                calls, errors = run_concurrent(convert, concurrency, args.seconds)
+                print(f"concurrency={concurrency:4} {calls / args.seconds:8.1f} req/s  upstream hits={stub.hits}  errors={errors}")
+
+def bench_stats(args):
+    """/ai-tips inputs: full recompute over transactions vs user_stats, then a consistency check."""
+    import random
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "finance.db")
+    import database
+    database.init_db()
+    rng = random.Random(1)
+    rows = [(rng.choice(("income", "expense")), f"cat{rng.randrange(15)}", round(rng.uniform(1, 500), 2),
+             f"20{rng.randrange(10, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}") for _ in range(args.rows)]
+    for start in range(0, len(rows), 10_000):
+        database.add_transactions_bulk("bench", rows[start:start + 10_000])
+    # Mix in updates and deletes so the incremental paths are exercised too
+    for tx_id in rng.sample(range(1, args.rows + 1), min(500, args.rows)):
+        if rng.random() < 0.5:
+            database.delete_transaction(tx_id, "bench")
+        else:
+            database.update_transaction(tx_id, "bench", "expense", "moved", 9.99, "2024-02-29")
+
+    start = time.perf_counter()
+    totals = {}
+    for batch in database.iter_transactions("bench"):
+        for _, _, t_type, category, amount, _ in batch:
+            totals[(t_type, category)] = totals.get((t_type, category), 0.0) + amount
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    database.get_user_stats("bench")
+    incremental = time.perf_counter() - start
+    print(f"rows={args.rows} full recompute {full * 1000:.1f} ms, user_stats {incremental * 1000:.2f} ms")
+    mismatches = database.check_stats()
+    print("consistent" if not mismatches else f"MISMATCH: {mismatches[:5]}")
+    if mismatches:
+        sys.exit(1)
+
+def bench_responses(args):
+    """
+    Latency and wire size of GET /transactions/me for 1k/10k/100k-row histories:
+    default vs FAST_RESPONSES=1, with and without gzip. The 1k case is also
+    measured as one limit=1000 page, the only path that used response-model
+    validation.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (1_000, 10_000, 100_000):
+            db_path = os.path.join(tmp, f"{rows}.db")
+            fill_transactions(db_path, "bench", rows)
+            for mode, env in (("default", {"FAST_RESPONSES": "0"}), ("fast", {"FAST_RESPONSES": "1"})):
+                with serve(env, db_path=db_path) as base:
+                    headers = login(base, "bench")
+                    cases = [("stream", {}, "identity"), ("stream", {}, "gzip")]
+                    if rows == 1_000:
+                        cases = [("page", {"limit": 1000}, "identity"), ("page", {"limit": 1000}, "gzip")] + cases
+                    for label, params, encoding in cases:
+                        timings = []
+                        size = 0
+                        for _ in range(5):
+                            start = time.perf_counter()
+                            r = requests.get(f"{base}/transactions/me", params=params, timeout=120, stream=True,
+                                             headers={**headers, "Accept-Encoding": encoding})
+                            size = len(r.raw.read())
+                            timings.append(time.perf_counter() - start)
+                        timings.sort()
+                        print(f"rows={rows:7} {mode:7} {label:6} {encoding:8} median {timings[2] * 1000:8.1f} ms  "
+                              f"{size / 1024:9.1f} KiB on the wire")
+
+
+def bench_writers(args):
+    """
+    Sustained add_transaction throughput with 1, 8 and 64 writer threads:
+    one transaction per call vs the group-commit writer (waiting for the
+    commit, and returning once the row id is known), under synchronous
+    NORMAL and FULL.
+    """
+    import database
+    tmp = tempfile.mkdtemp()
+    for synchronous in ("NORMAL", "FULL"):
+        for mode in ("direct", "group", "group-nowait"):
+            for writers in (1, 8, 64):
+                database.close_connections()
+                database.SYNCHRONOUS = synchronous
+                database.WRITE_BEHIND = mode != "direct"
+                database.DB_PATH = os.path.join(tmp, f"{synchronous}-{mode}-{writers}.db")
+                database.init_db()
+                durable = mode != "group-nowait"
+                counts = [0] * writers
+                errors = [0] * writers
+                stop = time.perf_counter() + args.seconds
+
+                def worker(i):
+                    while time.perf_counter() < stop:
+                        try:
+                            database.add_transaction(f"w{i}", "expense", "bench", 1.0, "2024-01-01", durable=durable)
+                            counts[i] += 1
+                        except sqlite3.Error:
+                            errors[i] += 1
+
+                threads = [threading.Thread(target=worker, args=(i,)) for i in range(writers)]
+                start = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                database.stop_writers()
+                elapsed = time.perf_counter() - start
+                print(f"synchronous={synchronous:6} {mode:12} writers={writers:3} "
+                      f"{sum(counts) / elapsed:9.0f} inserts/s  errors={sum(errors)}")
+    database.close_connections()
+
+# Streamlit pages and the API calls one uncached rerun of each makes
+PAGES = ("home", "charts", "budget", "history", "history-rerun", "add")
+
+def visit_page(client, base: str, headers: dict, page: str, state: dict):
+    """Make one rerun's worth of API calls for `page`; state["version"] tracks the delta-sync version."""
+    def get(path, **params):
+        r = client.request("GET", base + path, params=params, headers=headers, timeout=30)
+        r.raise_for_status()
+        return r.json()
+
+    if page == "home":
+        get("/me/dashboard", period="all")
+    elif page == "charts":
+        get("/me/dashboard", period="all")
+        get("/me/series", bucket="week", points=400)
+    elif page == "budget":
+        get("/me/dashboard", period="month", month=time.strftime("%Y-%m"))
+    elif page == "history":
+        state["version"] = get("/transactions/changes", since=0)["version"]
+    elif page == "history-rerun":
+        state["version"] = get("/transactions/changes", since=state["version"])["version"]
+    elif page == "add":
+        r = client.request("POST", base + "/transactions", headers=headers, timeout=30,
+                           json={"type": "expense", "category": "Food", "amount": 12.5, "date": "2024-05-01"})
+        r.raise_for_status()
+        state["version"] = get("/transactions/changes", since=state["version"])["version"]
+    else:
+        raise ValueError(f"unknown page {page!r}")
+
+def bench_transport(args):
+    """
+    Per-page latency of the Streamlit client's API calls over loopback HTTP
+    (keep-alive session) vs the in-process ASGI transport, for a user with
+    --rows transactions (capped at 20k: the history page loads them all).
+    """
+    import api_client
+    rows = min(args.rows, 20_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "finance.db")
+        fill_transactions(db_path, "bench", rows)
+        # The in-process app must verify the uvicorn server's tokens
+        os.environ.setdefault("JWT_SECRET", "bench-secret")
+        with serve(db_path=db_path) as base:
+            headers = login(base, "bench")
+            # Rollups and change versions for the rows loaded behind the API's back
+            import database
+            database.rebuild_rollups(db_path)
+            database.close_connections()
+            clients = (("http", api_client.http_session(), base),
+                       ("inprocess", api_client.InProcessSession(), "http://finance.inprocess"))
+            for page in PAGES:
+                for transport, client, url in clients:
+                    state = {"version": 0}
+                    visit_page(client, url, headers, "history", state)
+                    timings = []
+                    stop = time.perf_counter() + args.seconds / len(PAGES) / len(clients)
+                    while time.perf_counter() < stop or len(timings) < 5:
+                        start = time.perf_counter()
+                        visit_page(client, url, headers, page, state)
+                        timings.append(time.perf_counter() - start)
+                    timings.sort()
+                    print(f"rows={rows} {page:13} {transport:9} n={len(timings):5}  "
+                          f"p50 {timings[len(timings) // 2] * 1000:7.2f} ms  "
+                          f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f} ms")
+
+BENCHMARKS = {
+    "auth": bench_auth,
+    "import": bench_import,
+    "listing": bench_listing,
+    "plans": bench_plans,
+    "pool": bench_pool,
+    "rates": bench_rates,
+    "responses": bench_responses,
+    "rates-load": bench_rates_load,
+    "stats": bench_stats,
+    "transport": bench_transport,
+    "writers": bench_writers,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
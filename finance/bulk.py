@@ -0,0 +1,166 @@
+"""
+Bulk import/export helpers: turn a CSV / NDJSON upload into validated
+(type, category, amount, date) rows plus per-line errors, and stream row
+batches back out as CSV, optionally gzipped.
+"""
+import codecs
+import csv
+import io
+import json
+import math
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+CSV_COLUMNS = ("type", "category", "amount", "date")
+TX_TYPES = ("income", "expense")
+
+def validate_row(record: dict, today: str) -> tuple:
+    """Return a (type, category, amount, date) tuple or raise ValueError with a readable reason."""
+    t_type = _text(record, "type").lower()
+    if t_type not in TX_TYPES:
+        raise ValueError(f"type must be one of {', '.join(TX_TYPES)}")
+    try:
+        amount = float(record.get("amount"))
+    except (TypeError, ValueError):
+        raise ValueError("amount must be a number")
+    if not math.isfinite(amount):
+        raise ValueError("amount must be a finite number")
+    date = _text(record, "date") or today
+    if not is_valid_date(date):
+        raise ValueError("date must be YYYY-MM-DD")
+    category = record.get("category")
+    category = "" if category is None else str(category).strip()
+    return t_type, category, amount, date
+
+def _text(record: dict, key: str) -> str:
+    # NDJSON values can be numbers, lists, ...: a per-line error, not a crash
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    return value.strip()
+
+@lru_cache(maxsize=8192)
+def is_valid_date(date: str) -> bool:
+    # Imports repeat the same few thousand dates, so strptime runs once per date
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return len(date) == 10
+
+class HeaderError(ValueError):
+    """The CSV header is missing or lacks required columns: the whole upload is refused."""
+
+def parse_header(values: list) -> list:
+    """Column names from a parsed CSV header record; raises HeaderError when required columns are missing."""
+    header = [h.strip().lower() for h in values]
+    if header:
+        header[0] = header[0].lstrip("\ufeff")
+    missing = {"type", "amount"} - set(header)
+    if missing:
+        raise HeaderError(f"CSV header is missing: {', '.join(sorted(missing))}")
+    return header
+
+def text_lines(chunks):
+    """Decode a stream of byte chunks into lines that keep their line ending, as csv.reader expects."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf = ""
+    for chunk in chunks:
+        buf += decoder.decode(chunk)
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        yield buf
+
+def csv_records(lines):
+    """
+    (line_no, record) for every CSV record after the header, read by one
+    csv.reader over the whole upload, so quoted fields may span lines (blank
+    ones included) wherever the upload is chunked. line_no is the record's
+    first line; a record that does not parse comes as a ValueError instead
+    of a dict.
+    """
+    reader = csv.reader(lines, strict=True)
+    header = None
+    while True:
+        line_no = reader.line_num + 1
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # Quoted fields never end: everything after the quote was read into one field
+            reason = "unterminated quoted field" if "unexpected end of data" in str(e) else f"malformed CSV: {e}"
+            if header is None:
+                raise HeaderError(f"CSV header: {reason}")
+            yield line_no, ValueError(reason)
+            continue
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = parse_header(values)
+            continue
+        yield line_no, dict(zip(header, values))
+
+def ndjson_records(lines):
+    """(line_no, record) for every non-blank NDJSON line; invalid ones come as a ValueError."""
+    for line_no, line in enumerate(lines, 1):
+        if line.strip():
+            yield line_no, _json_record(line)
+
+def validate_records(records: list, today: Optional[str] = None) -> tuple:
+    """
+    Validate a chunk of (line_no, record) pairs from csv_records or
+    ndjson_records. Returns (rows, errors) where errors are
+    {"line": n, "error": reason} dicts.
+    """
+    today = today or datetime.today().strftime("%Y-%m-%d")
+    rows = []
+    errors = []
+    for line_no, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            rows.append(validate_row(record, today))
+        except ValueError as e:
+            errors.append({"line": line_no, "error": str(e)})
+    return rows, errors
+
+def _json_record(line: str):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return ValueError("invalid JSON")
+    if not isinstance(record, dict):
+        return ValueError("each line must be a JSON object")
+    return record
+
+
+# --- Export ---
+def csv_chunks(batches, columns: tuple):
+    """One CSV text chunk per batch of row tuples, header first."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def gzip_chunks(chunks, level: int = 6):
+    """Gzip a stream of str/bytes chunks incrementally (one gzip member)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
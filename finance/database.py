@@ -1,21 +1,466 @@
+import hashlib
 import os
+import queue
 import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
 from typing import Optional
 from datetime import datetime
-import pandas as pd
 
 BASE_DIR = os.path.dirname(__file__)
 DB_DIR = os.path.join(BASE_DIR, "data")
 DB_PATH = os.environ.get("DATABASE_PATH", os.path.join(DB_DIR, "finance.db"))
 
+# Connection tuning. DB_POOL=0 falls back to one plain connection per call
+# (the old behaviour), which is only useful for benchmarking.
+DB_POOL = os.environ.get("DB_POOL", "1") != "0"
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "16384"))
+MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+# Per-user sharding: with DB_SHARDS > 1 each user's rows live in one of N
+# files next to DB_PATH (finance.shard0.db, ...), picked by a hash of the
+# username, so users on different shards never wait on each other's writer
+# lock. Shared data (exchange rates) stays in DB_PATH. Changing DB_SHARDS on
+# an existing deployment needs reshard(); until then init_db() refuses to
+# start (see check_layout).
+DB_SHARDS = int(os.environ.get("DB_SHARDS", "0"))
+
+# NORMAL only syncs the WAL at checkpoints; FULL syncs on every commit.
+SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL").upper()
+
+# Write-behind: writes are queued to one writer thread per database file,
+# which commits them in groups (see _GroupWriter).
+WRITE_BEHIND = os.environ.get("DB_WRITE_BEHIND", "0") == "1"
+WRITE_BATCH_MAX = int(os.environ.get("DB_WRITE_BATCH_MAX", "256"))
+# Extra time to wait for more writes before committing. 0 commits whatever
+# queued up while the previous group was running, which batches under load
+# without delaying a lone writer.
+WRITE_BATCH_WAIT_MS = float(os.environ.get("DB_WRITE_BATCH_WAIT_MS", "0"))
+# How often a waiting write checks that its writer thread is still alive
+WRITER_CHECK_SECONDS = 0.5
+
 def _ensure_dir():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-def init_db():
-    _ensure_dir()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
+def shard_paths() -> list:
+    """Every file that holds user data: [DB_PATH] unless sharding is on."""
+    if DB_SHARDS <= 1:
+        return [DB_PATH]
+    root, ext = os.path.splitext(DB_PATH)
+    return [f"{root}.shard{i}{ext}" for i in range(DB_SHARDS)]
+
+def shard_of(username: str) -> int:
+    # crc32 rather than hash(): it must not change between processes
+    return zlib.crc32(username.encode()) % DB_SHARDS if DB_SHARDS > 1 else 0
+
+def user_path(username: str) -> str:
+    """The database file holding `username`'s rows."""
+    if DB_SHARDS <= 1:
+        return DB_PATH
+    root, ext = os.path.splitext(DB_PATH)
+    return f"{root}.shard{shard_of(username)}{ext}"
+
+# --- Connections ---
+# Every thread keeps one open connection per database file, so a request no
+# longer pays for sqlite3.connect() + schema parsing. WAL lets readers run
+# while a writer is active, and busy_timeout makes a second writer wait for
+# the lock instead of failing with "database is locked".
+_local = threading.local()
+_all_conns = []
+_conns_lock = threading.Lock()
+_generation = 0
+
+def _open(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    # Transactions are opened explicitly in _db()
+    conn.isolation_level = None
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    # NORMAL is durable across application crashes in WAL mode; only an OS
+    # crash / power loss can drop the last commits.
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+def get_conn(path: Optional[str] = None) -> sqlite3.Connection:
+    """Return this thread's connection to `path` (default DB_PATH), opening it if needed."""
+    path = path or DB_PATH
+    if getattr(_local, "generation", None) != _generation:
+        _local.conns = {}
+        _local.generation = _generation
+    conn = _local.conns.get(path)
+    if conn is None:
+        conn = _open(path)
+        _local.conns[path] = conn
+        with _conns_lock:
+            _all_conns.append(conn)
+    return conn
+
+def close_connections():
+    """Close every pooled connection (called on API shutdown)."""
+    global _generation
+    stop_writers()
+    with _conns_lock:
+        for conn in _all_conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _all_conns.clear()
+        _stream_idle.clear()
+        _generation += 1
+
+# Connections for streamed reads (_iter_rows): not tied to a thread, since
+# a stream can resume on another worker. Idle ones are kept per file for the
+# next stream instead of paying connect + PRAGMAs each time.
+STREAM_POOL_SIZE = int(os.environ.get("DB_STREAM_POOL_SIZE", "8"))
+_stream_idle = {}
+
+def _checkout_stream_conn(path: str) -> tuple:
+    """(connection, pool generation) for one stream; give it back with _return_stream_conn."""
+    if not DB_POOL:
+        return sqlite3.connect(path, check_same_thread=False), None
+    with _conns_lock:
+        generation = _generation
+        idle = _stream_idle.get(path)
+        if idle:
+            return idle.pop(), generation
+    conn = _open(path)
+    with _conns_lock:
+        _all_conns.append(conn)
+    return conn, generation
+
+def _return_stream_conn(path: str, conn: sqlite3.Connection, generation: Optional[int]):
+    with _conns_lock:
+        if generation == _generation and not conn.in_transaction:
+            idle = _stream_idle.setdefault(path, [])
+            if len(idle) < STREAM_POOL_SIZE:
+                idle.append(conn)
+                return
+        if conn in _all_conns:
+            _all_conns.remove(conn)
+    conn.close()
+
+@contextmanager
+def _db(write: bool = False, path: Optional[str] = None):
+    """
+    Yield a connection inside a transaction that commits on success and rolls
+    back on error. Writers take the lock up front (BEGIN IMMEDIATE) so they
+    queue on busy_timeout instead of deadlocking on a read->write upgrade.
+    """
+    if not DB_POOL:
+        conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+        return
+    conn = get_conn(path)
+    conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    _execute(conn, "COMMIT")
+
+# --- Query hooks ---
+# Runtime statements go through the helpers below, which report each one to
+# the registered hooks as hook(conn, sql, params, seconds, rows): rows
+# returned for queries, rows changed for writes. Hooks run on the calling thread and must
+# not raise. With no hooks registered the helpers are a plain execute/fetch.
+_query_hooks = []
+
+def add_query_hook(hook):
+    if hook not in _query_hooks:
+        _query_hooks.append(hook)
+
+def remove_query_hook(hook):
+    if hook in _query_hooks:
+        _query_hooks.remove(hook)
+
+def _observe(conn: sqlite3.Connection, sql: str, params, seconds: float, rows: int):
+    for hook in _query_hooks:
+        hook(conn, sql, params, seconds, rows)
+
+def _fetchall(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    if not _query_hooks:
+        return conn.execute(sql, params).fetchall()
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    _observe(conn, sql, params, time.perf_counter() - start, len(rows))
+    return rows
+
+def _fetchone(conn: sqlite3.Connection, sql: str, params=()):
+    if not _query_hooks:
+        return conn.execute(sql, params).fetchone()
+    start = time.perf_counter()
+    row = conn.execute(sql, params).fetchone()
+    _observe(conn, sql, params, time.perf_counter() - start, 0 if row is None else 1)
+    return row
+
+def _execute(conn: sqlite3.Connection, sql: str, params=()) -> sqlite3.Cursor:
+    if not _query_hooks:
+        return conn.execute(sql, params)
+    start = time.perf_counter()
+    cur = conn.execute(sql, params)
+    _observe(conn, sql, params, time.perf_counter() - start, max(cur.rowcount, 0))
+    return cur
+
+def _executemany(conn: sqlite3.Connection, sql: str, seq_params: list) -> sqlite3.Cursor:
+    if not _query_hooks:
+        return conn.executemany(sql, seq_params)
+    start = time.perf_counter()
+    cur = conn.executemany(sql, seq_params)
+    _observe(conn, sql, seq_params, time.perf_counter() - start, max(cur.rowcount, 0))
+    return cur
+
+# --- Slow-query log ---
+# Opt-in (SLOW_QUERY_MS or set_slow_query_threshold()): statements slower than
+# the threshold are kept in a ring buffer with their duration, fingerprinted
+# parameters and EXPLAIN QUERY PLAN. It is an ordinary query hook, so while
+# it is off it costs nothing.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "0") or 0)
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "200"))
+
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_slow_threshold = 0.0
+
+def set_slow_query_threshold(ms: Optional[float]):
+    """Record statements slower than `ms` milliseconds; None or 0 turns the log off."""
+    global _slow_threshold
+    _slow_threshold = (ms or 0) / 1000
+    if _slow_threshold:
+        add_query_hook(_log_slow_query)
+    else:
+        remove_query_hook(_log_slow_query)
+
+def slow_query_threshold() -> float:
+    """Current threshold in milliseconds (0 = off)."""
+    return _slow_threshold * 1000
+
+def slow_queries(clear: bool = False) -> list:
+    """The recorded slow statements, newest first."""
+    entries = list(_slow_queries)
+    if clear:
+        _slow_queries.clear()
+    return entries[::-1]
+
+# Per-process key: fingerprints match within this process but cannot be
+# reversed offline by hashing candidate values (e.g. a password dictionary)
+_FINGERPRINT_KEY = os.urandom(16)
+
+def fingerprint_params(params) -> list:
+    """
+    Parameter types and short keyed hashes instead of values: equal values
+    can be matched up across entries without usernames, passwords or amounts
+    ending up in the log.
+    """
+    if isinstance(params, dict):
+        params = list(params.values())
+    return [
+        "null" if p is None else f"{type(p).__name__}:{hashlib.blake2b(repr(p).encode(), digest_size=4, key=_FINGERPRINT_KEY).hexdigest()}"
+        for p in params
+    ]
+
+def _log_slow_query(conn: sqlite3.Connection, sql: str, params, seconds: float, rows: int):
+    if seconds < _slow_threshold:
+        return
+    many = isinstance(params, list) and params and isinstance(params[0], (tuple, list, dict))
+    sample = params[0] if many else params
+    try:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, sample)]
+        db = conn.execute("PRAGMA database_list").fetchone()[2]
+    except sqlite3.Error:
+        plan, db = [], ""
+    _slow_queries.append({
+        "at": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "ms": round(seconds * 1000, 3),
+        "rows": rows,
+        "sql": " ".join(sql.split()),
+        "params": fingerprint_params(sample),
+        "executions": len(params) if many else 1,
+        "plan": plan,
+        "db": os.path.basename(db),
+    })
+
+if SLOW_QUERY_MS:
+    set_slow_query_threshold(SLOW_QUERY_MS)
+
+# --- Group commit ---
+# In write-behind mode every write is a function fn(conn, *args) handed to a
+# single writer thread. The writer drains the queue (up to WRITE_BATCH_MAX
+# operations, lingering WRITE_BATCH_WAIT_MS if set) and runs the whole group
+# in one transaction, so N concurrent writers share one lock acquisition and
+# one commit (one fsync with DB_SYNCHRONOUS=FULL) instead of paying for N.
+# Each operation runs inside its own SAVEPOINT, so a failing one (e.g. a
+# duplicate username) is rolled back alone and does not poison the group.
+# Every op gets a result or an exception, even when the writer thread itself
+# dies (e.g. its connection cannot be opened); the next write starts a new one.
+class _WriteOp:
+    __slots__ = ("fn", "args", "result", "error", "executed", "committed")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.result = None
+        self.error = None
+        self.executed = threading.Event()
+        self.committed = threading.Event()
+
+
+class _GroupWriter(threading.Thread):
+    def __init__(self, path: str):
+        super().__init__(name=f"db-writer:{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.error = None
+        self.start()
+
+    def submit(self, fn, args) -> _WriteOp:
+        op = _WriteOp(fn, args)
+        self.queue.put(op)
+        return op
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        conn = None
+        try:
+            conn = _open(self.path)
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    self._apply(conn, batch)
+                if batch is None or (batch and batch[-1] is None):
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            # Nobody may wait on a writer that is gone: fail whatever is still queued
+            self._fail_queued(self.error or RuntimeError(f"{self.name} stopped"))
+            if conn is not None:
+                conn.close()
+
+    def _fail_queued(self, error: BaseException):
+        while True:
+            try:
+                op = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if op is not None:
+                op.error = error
+                op.executed.set()
+                op.committed.set()
+
+    def _next_batch(self) -> Optional[list]:
+        op = self.queue.get()
+        if op is None:
+            return None
+        batch = [op]
+        deadline = time.monotonic() + WRITE_BATCH_WAIT_MS / 1000
+        while len(batch) < WRITE_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                op = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(op)
+            if op is None:
+                break
+        return batch
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, batch: list):
+        """
+        Run and commit one group. A failing ROLLBACK escapes (and ends the
+        writer: its connection is in an unknown state), but only after every
+        op has its error and its events set.
+        """
+        ops = [op for op in batch if op is not None]
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in ops:
+                conn.execute("SAVEPOINT op")
+                try:
+                    op.result = op.fn(conn, *op.args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    op.error = e
+                conn.execute("RELEASE op")
+                op.executed.set()
+            _execute(conn, "COMMIT")
+        except BaseException as e:
+            for op in ops:
+                if op.error is None:
+                    op.error = e
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        finally:
+            for op in ops:
+                op.executed.set()
+                op.committed.set()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def _writer(path: str) -> _GroupWriter:
+    writer = _writers.get(path)
+    if writer is None or not writer.is_alive():
+        with _writers_lock:
+            writer = _writers.get(path)
+            if writer is None or not writer.is_alive():
+                writer = _writers[path] = _GroupWriter(path)
+    return writer
+
+def stop_writers():
+    """Flush and stop the write-behind threads."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
+
+def _write(fn, *args, durable: bool = True, path: Optional[str] = None):
+    """
+    Run fn(conn, *args) in a write transaction and return its result.
+
+    With WRITE_BEHIND the call goes through the group writer. durable=False
+    returns as soon as fn has run (row ids are already known), before the
+    group commits; a crash in that window loses the write, and readers on
+    other connections see it only after the commit.
+    """
+    if not WRITE_BEHIND:
+        with _db(write=True, path=path) as conn:
+            return fn(conn, *args)
+    writer = _writer(path or DB_PATH)
+    op = writer.submit(fn, args)
+    done = op.committed if durable else op.executed
+    while not done.wait(WRITER_CHECK_SECONDS):
+        # Queued after the writer drained its queue and exited: nobody will answer
+        if not writer.is_alive() and not done.is_set():
+            raise RuntimeError(f"{writer.name} stopped before running the write") from writer.error
+    if op.error is not None:
+        raise op.error
+    return op.result
+
+# --- Schema migrations ---
+# Each migration runs exactly once per database file, in version order, and
+# is recorded in schema_version. Never edit a migration that has shipped:
+# append a new one instead.
+def _m001_base_tables(conn: sqlite3.Connection):
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,7 +469,7 @@ def init_db():
         )
         """
     )
-    c.execute(
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS transactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,32 +481,288 @@ def init_db():
         )
         """
     )
-    conn.commit()
-    conn.close()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_goals (
+            username TEXT PRIMARY KEY,
+            goal_amount REAL NOT NULL
+        )
+        """
+    )
+
+def _m002_transactions_user_date_index(conn: sqlite3.Connection):
+    # Serves "WHERE username = ? ORDER BY date DESC, id DESC" without a sort
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_date ON transactions (username, date DESC, id DESC)"
+    )
+
+def _m003_transactions_month(conn: sqlite3.Connection):
+    # Integer YYYYMM bucket for month ranges and per-month grouping
+    conn.execute("ALTER TABLE transactions ADD COLUMN month INTEGER")
+    conn.execute(
+        "UPDATE transactions SET month = CAST(substr(date, 1, 4) AS INTEGER) * 100 + CAST(substr(date, 6, 2) AS INTEGER)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_transactions_user_month ON transactions (username, month)")
+
+def _m004_tx_rollup(conn: sqlite3.Connection):
+    # Per user/month/type/category sums, kept current by every transaction write
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tx_rollup (
+            username TEXT NOT NULL,
+            month INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (username, month, type, category)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO tx_rollup (username, month, type, category, total, count)
+        SELECT username, month, type, COALESCE(category, ''), SUM(amount), COUNT(*)
+        FROM transactions GROUP BY username, month, type, COALESCE(category, '')
+        """
+    )
+
+def _m005_exchange_rates(conn: sqlite3.Connection):
+    # Last known rate per currency pair, so a restarted API starts with a warm cache
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            pair TEXT PRIMARY KEY,
+            rate REAL NOT NULL,
+            source TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """
+    )
+
+def _m006_user_stats(conn: sqlite3.Connection):
+    # All-time per user/type/category sums, so stats cost O(categories)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            username TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (username, type, category)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO user_stats (username, type, category, total, count)
+        SELECT username, type, COALESCE(category, ''), SUM(amount), COUNT(*)
+        FROM transactions GROUP BY username, type, COALESCE(category, '')
+        """
+    )
+
+def _m007_data_versions(conn: sqlite3.Connection):
+    # Bumped by every write to a user's data; drives ETags on read endpoints
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            username TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+def _m008_change_tracking(conn: sqlite3.Connection):
+    # Delta sync: each row carries the owner's data version of its last write,
+    # and deletes leave a tombstone, so "what changed since version v" is two
+    # index range scans (see get_changes)
+    conn.execute("ALTER TABLE transactions ADD COLUMN version INTEGER")
+    # Existing rows count as each owner's first change; without a data
+    # version of their own, since=0 would answer version 0 and clients would
+    # never apply the snapshot
+    conn.execute("UPDATE transactions SET version = 1")
+    conn.execute("INSERT OR IGNORE INTO data_versions (username, version) SELECT DISTINCT username, 1 FROM transactions")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_transactions_user_version ON transactions (username, version)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tx_tombstones (
+            username TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (username, id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_tx_tombstones_user_version ON tx_tombstones (username, version)")
+
+def _m009_metadata(conn: sqlite3.Connection):
+    # Facts about the file itself, e.g. the shard layout its rows belong to (see check_layout)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "transactions (username, date, id) index", _m002_transactions_user_date_index),
+    (3, "transactions month bucket", _m003_transactions_month),
+    (4, "tx_rollup aggregates", _m004_tx_rollup),
+    (5, "exchange_rates cache", _m005_exchange_rates),
+    (6, "user_stats running totals", _m006_user_stats),
+    (7, "per-user data versions", _m007_data_versions),
+    (8, "transaction change tracking", _m008_change_tracking),
+    (9, "file metadata", _m009_metadata),
+]
+
+def migrate(path: Optional[str] = None) -> int:
+    """Apply pending migrations to the database at `path` and return its schema version."""
+    with _db(write=True, path=path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+        for version, name, apply in MIGRATIONS:
+            if version in applied:
+                continue
+            apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.utcnow().isoformat(timespec="seconds")),
+            )
+        return max(applied | {v for v, _, _ in MIGRATIONS})
+
+def init_db():
+    """Migrate every database file, then check_layout()."""
+    _migrate_all()
+    check_layout()
+
+def _migrate_all():
+    _ensure_dir()
+    migrate()
+    for path in shard_paths():
+        if path != DB_PATH:
+            migrate(path)
+
+# --- Shard layout ---
+# Every file records the shard count its rows were placed for. Starting with
+# a different DB_SHARDS would route existing users to files without their
+# rows (empty accounts, and the same username could register twice), so
+# init_db() refuses to start until reshard() has moved the data.
+def _recorded_shards(path: str) -> tuple:
+    """(shard count recorded in `path` or None, whether it holds any users)."""
+    with _db(path=path) as conn:
+        row = _fetchone(conn, "SELECT value FROM metadata WHERE key = 'shards'")
+        has_users = _fetchone(conn, "SELECT 1 FROM users LIMIT 1") is not None
+    return (int(row[0]) if row else None), has_users
+
+def _record_shards(path: str, shards: int):
+    with _db(write=True, path=path) as conn:
+        _execute(conn, "INSERT OR REPLACE INTO metadata (key, value) VALUES ('shards', ?)", (str(shards),))
+
+def check_layout():
+    """
+    Record the current shard count in files that have none yet; raise
+    RuntimeError if any file was laid out for a different DB_SHARDS.
+    """
+    expected = len(shard_paths())
+    paths = [DB_PATH] + [path for path in shard_paths() if path != DB_PATH]
+    recorded = {path: _recorded_shards(path) for path in paths}
+    layouts = {path: shards for path, (shards, _) in recorded.items()}
+    # Files from before the layout was recorded: users in DB_PATH and in no
+    # shard mean an unsharded database that was never resharded
+    if expected > 1 and layouts[DB_PATH] is None and recorded[DB_PATH][1] \
+            and not any(recorded[path] != (None, False) for path in paths[1:]):
+        layouts[DB_PATH] = 1
+    for path, shards in layouts.items():
+        if shards is not None and shards != expected:
+            raise RuntimeError(
+                f"{path} holds data laid out for {shards} shard(s), but DB_SHARDS={DB_SHARDS} means {expected}: "
+                "restore the old DB_SHARDS, or split an unsharded database with `python manage.py reshard`"
+            )
+    for path, shards in layouts.items():
+        if shards is None:
+            _record_shards(path, expected)
+
+# Per-user tables, in the order reshard() copies them
+USER_TABLES = ("users", "transactions", "user_goals", "tx_rollup", "user_stats", "data_versions", "tx_tombstones")
+
+def reshard(source: Optional[str] = None) -> dict:
+    """
+    Copy every user's rows from `source` (default DB_PATH), an unsharded
+    database, into their shard under the current DB_SHARDS and record the
+    new layout in every file. Run it once, offline, with the API stopped
+    (`python manage.py reshard`). The rows stay in `source`, unread, as a
+    backup. Returns {shard path: users in it}; {} if already resharded.
+    """
+    source = source or DB_PATH
+    if DB_SHARDS <= 1:
+        raise ValueError("set DB_SHARDS to the new shard count first")
+    _migrate_all()
+    # SELECT * needs the same columns on both sides
+    migrate(source)
+    layout, _ = _recorded_shards(source)
+    if layout == len(shard_paths()):
+        return {}
+    if layout not in (None, 1):
+        raise ValueError(f"{source} is laid out for {layout} shards; reshard only splits an unsharded database")
+    copied = {}
+    for index, path in enumerate(shard_paths()):
+        conn = _open(path)
+        try:
+            conn.create_function("shard_of", 1, shard_of, deterministic=True)
+            # ATTACH is not allowed inside a transaction, hence no _db() here
+            conn.execute("ATTACH DATABASE ? AS src", (source,))
+            conn.execute("BEGIN IMMEDIATE")
+            for table in USER_TABLES:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO main.{table} SELECT * FROM src.{table} WHERE shard_of(username) = ?",
+                    (index,),
+                )
+            conn.execute("COMMIT")
+            copied[path] = conn.execute("SELECT COUNT(*) FROM main.users").fetchone()[0]
+        finally:
+            conn.close()
+    for path in {source, DB_PATH, *shard_paths()}:
+        _record_shards(path, len(shard_paths()))
+    return copied
+
+def _month_bucket(date: str) -> int:
+    return int(date[0:4]) * 100 + int(date[5:7])
+
+def explain(sql: str, params: tuple = ()) -> list:
+    """EXPLAIN QUERY PLAN for `sql`, one detail string per plan step."""
+    with _db() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
 
 # --- Users (PLAIN TEXT for course project) ---
 def register_user(username: str, password: str) -> bool:
     if not username or not password:
         return False
     _ensure_dir()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     try:
-        # Storing plain text password (Not for production)
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
+        _write(_insert_user, username, password, path=user_path(username))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
+
+def _insert_user(conn: sqlite3.Connection, username: str, password: str):
+    # Storing plain text password (Not for production)
+    _execute(conn, "INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
 
 def get_password(username: str) -> Optional[str]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    row = c.fetchone()
-    conn.close()
+    with _db(path=user_path(username)) as conn:
+        row = _fetchone(conn, "SELECT password FROM users WHERE username = ?", (username,))
     return row[0] if row else None
 
 def authenticate_user(username: str, password: str) -> bool:
@@ -71,89 +772,531 @@ def authenticate_user(username: str, password: str) -> bool:
     # Direct comparison (Plain text)
     return password == stored
 
+# --- Data versions ---
+def _bump_version(conn: sqlite3.Connection, username: str) -> int:
+    """Increment `username`'s data version inside the caller's write transaction."""
+    _execute(
+        conn,
+        """
+        INSERT INTO data_versions (username, version) VALUES (?, 1)
+        ON CONFLICT (username) DO UPDATE SET version = version + 1
+        """,
+        (username,),
+    )
+    return _fetchone(conn, "SELECT version FROM data_versions WHERE username = ?", (username,))[0]
+
+def get_data_version(username: str) -> int:
+    """Monotonic counter of changes to `username`'s transactions and goal (0 = never written)."""
+    with _db(path=user_path(username)) as conn:
+        row = _fetchone(conn, "SELECT version FROM data_versions WHERE username = ?", (username,))
+    return row[0] if row else 0
+
+# --- Rollups ---
+def _rollup_add(conn: sqlite3.Connection, username: str, month: int, t_type: str, category: Optional[str],
+                amount: float, count: int):
+    """
+    Add (or with negative amount/count, remove) rows from a user's tx_rollup
+    bucket and the matching all-time user_stats entry.
+    """
+    key = (username, month, t_type, category or "")
+    _execute(
+        conn,
+        """
+        INSERT INTO tx_rollup (username, month, type, category, total, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (username, month, type, category)
+        DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+        """,
+        key + (amount, count),
+    )
+    stats_key = (username, t_type, category or "")
+    _execute(
+        conn,
+        """
+        INSERT INTO user_stats (username, type, category, total, count) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (username, type, category)
+        DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+        """,
+        stats_key + (amount, count),
+    )
+    if count < 0:
+        _execute(
+            conn, "DELETE FROM tx_rollup WHERE username = ? AND month = ? AND type = ? AND category = ? AND count <= 0", key
+        )
+        _execute(conn, "DELETE FROM user_stats WHERE username = ? AND type = ? AND category = ? AND count <= 0", stats_key)
+
+def get_user_stats(username: str) -> dict:
+    """All-time income, expense, count and per-category totals for `username` from user_stats."""
+    with _db(path=user_path(username)) as conn:
+        rows = _fetchall(conn, "SELECT type, category, total, count FROM user_stats WHERE username = ?", (username,))
+    stats = {"income": 0.0, "expense": 0.0, "count": 0, "categories": []}
+    for t_type, category, total, count in rows:
+        stats["count"] += count
+        if t_type in ("income", "expense"):
+            stats[t_type] += total
+        stats["categories"].append({"type": t_type, "category": category, "total": total, "count": count})
+    return stats
+
+def check_stats(username: Optional[str] = None, tolerance: float = 1e-6) -> list:
+    """
+    Recompute user_stats and tx_rollup from the raw transactions (for one user
+    or everyone) and return every entry that disagrees; [] means consistent.
+    """
+    where, params = ("WHERE username = ?", (username,)) if username else ("", ())
+    checks = (
+        ("user_stats", "username, type, COALESCE(category, '')", "username, type, category"),
+        ("tx_rollup", "username, month, type, COALESCE(category, '')", "username, month, type, category"),
+    )
+    mismatches = []
+    # Without a username this is an admin check: run it on every shard
+    for path in [user_path(username)] if username else shard_paths():
+        mismatches += _check_stats(path, checks, where, params, tolerance)
+    return mismatches
+
+def _check_stats(path: str, checks: tuple, where: str, params: tuple, tolerance: float) -> list:
+    mismatches = []
+    with _db(path=path) as conn:
+        for table, group, columns in checks:
+            expected = {
+                row[:-2]: row[-2:]
+                for row in _fetchall(
+                    conn, f"SELECT {group}, SUM(amount), COUNT(*) FROM transactions {where} GROUP BY {group}", params
+                )
+            }
+            actual = {row[:-2]: row[-2:] for row in _fetchall(conn, f"SELECT {columns}, total, count FROM {table} {where}", params)}
+            for key in expected.keys() | actual.keys():
+                want = expected.get(key, (0.0, 0))
+                got = actual.get(key, (0.0, 0))
+                if want[1] != got[1] or abs(want[0] - got[0]) > tolerance * max(1.0, abs(want[0])):
+                    mismatches.append({"table": table, "key": list(key), "expected": list(want), "actual": list(got)})
+    return mismatches
+
+def rebuild_rollups(path: Optional[str] = None):
+    """
+    Recompute tx_rollup and user_stats from the raw transactions in one
+    database file, bump the data version of every user in it and stamp rows
+    that have no change version yet. For bulk
+    loads that bypass the write functions, or to repair what check_stats()
+    reports.
+    """
+    with _db(write=True, path=path) as conn:
+        conn.execute("DELETE FROM tx_rollup")
+        conn.execute(
+            """
+            INSERT INTO tx_rollup (username, month, type, category, total, count)
+            SELECT username, month, type, COALESCE(category, ''), SUM(amount), COUNT(*)
+            FROM transactions GROUP BY username, month, type, COALESCE(category, '')
+            """
+        )
+        conn.execute("DELETE FROM user_stats")
+        # Summing the month buckets is much cheaper than a second pass over transactions
+        conn.execute(
+            """
+            INSERT INTO user_stats (username, type, category, total, count)
+            SELECT username, type, category, SUM(total), SUM(count)
+            FROM tx_rollup GROUP BY username, type, category
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO data_versions (username, version)
+            SELECT username, 1 FROM users WHERE true
+            ON CONFLICT (username) DO UPDATE SET version = version + 1
+            """
+        )
+        # Rows loaded without a change version count as changed now, so
+        # delta-syncing clients pick them up
+        conn.execute(
+            """
+            UPDATE transactions SET version = (SELECT version FROM data_versions d WHERE d.username = transactions.username)
+            WHERE version IS NULL
+            """
+        )
+
+def list_users() -> list:
+    """Admin view: every user with their transaction count and balance, merged across shards."""
+    users = []
+    for path in shard_paths():
+        with _db(path=path) as conn:
+            users += _fetchall(
+                conn,
+                """
+                SELECT u.username,
+                       COALESCE(SUM(s.count), 0),
+                       COALESCE(SUM(CASE s.type WHEN 'income' THEN s.total WHEN 'expense' THEN -s.total END), 0.0)
+                FROM users u LEFT JOIN user_stats s ON s.username = u.username
+                GROUP BY u.username
+                """,
+            )
+    users.sort()
+    return [{"username": u, "transactions": count, "balance": balance} for u, count, balance in users]
+
+def get_summary(username: str) -> dict:
+    """Totals, per-category and per-month sums for `username`, read from tx_rollup only."""
+    with _db(path=user_path(username)) as conn:
+        rows = _fetchall(
+            conn, "SELECT month, type, category, total, count FROM tx_rollup WHERE username = ? ORDER BY month", (username,)
+        )
+    totals = {"income": 0.0, "expense": 0.0, "count": 0}
+    by_category = {}
+    by_month = {}
+    for month, t_type, category, total, count in rows:
+        totals["count"] += count
+        if t_type in ("income", "expense"):
+            totals[t_type] += total
+        cat = by_category.setdefault((t_type, category), {"type": t_type, "category": category, "total": 0.0, "count": 0})
+        cat["total"] += total
+        cat["count"] += count
+        label = f"{month // 100:04d}-{month % 100:02d}"
+        m = by_month.setdefault(label, {"month": label, "income": 0.0, "expense": 0.0, "count": 0})
+        if t_type in ("income", "expense"):
+            m[t_type] += total
+        m["count"] += count
+    totals["balance"] = totals["income"] - totals["expense"]
+    for m in by_month.values():
+        m["balance"] = m["income"] - m["expense"]
+    return {
+        "totals": totals,
+        "by_category": sorted(by_category.values(), key=lambda c: -c["total"]),
+        "by_month": list(by_month.values()),
+    }
+
+def get_dashboard(username: str, first_month: int, last_month: int, series_from: int) -> dict:
+    """
+    Everything a dashboard page shows, from one read of `username`'s tx_rollup
+    rows plus the goal, in one snapshot: totals and per-category sums for the
+    months first_month..last_month (YYYYMM), all-time totals, and per-month
+    series for series_from..last_month. Each totals dict carries its top
+    expense category for the tips.
+    """
+    with _db(path=user_path(username)) as conn:
+        rows = _fetchall(
+            conn, "SELECT month, type, category, total, count FROM tx_rollup WHERE username = ? ORDER BY month", (username,)
+        )
+        goal = _fetchone(conn, "SELECT goal_amount FROM user_goals WHERE username = ?", (username,))
+    all_time = {"income": 0.0, "expense": 0.0, "count": 0}
+    totals = {"income": 0.0, "expense": 0.0, "count": 0}
+    all_expenses = {}
+    by_category = {}
+    series = {}
+    for month, t_type, category, total, count in rows:
+        all_time["count"] += count
+        if t_type in ("income", "expense"):
+            all_time[t_type] += total
+        if t_type == "expense":
+            all_expenses[category] = all_expenses.get(category, 0.0) + total
+        if first_month <= month <= last_month:
+            totals["count"] += count
+            if t_type in ("income", "expense"):
+                totals[t_type] += total
+            cat = by_category.setdefault((t_type, category), {"type": t_type, "category": category, "total": 0.0, "count": 0})
+            cat["total"] += total
+            cat["count"] += count
+        if series_from <= month <= last_month and t_type in ("income", "expense"):
+            m = series.setdefault(month, {"income": 0.0, "expense": 0.0})
+            m[t_type] += total
+    categories = sorted(by_category.values(), key=lambda c: -c["total"])
+    period_expenses = [c for c in categories if c["type"] == "expense"]
+    for t, top in ((totals, period_expenses[0]["category"] if period_expenses else None),
+                   (all_time, max(all_expenses, key=all_expenses.get) if all_expenses else None)):
+        t["balance"] = t["income"] - t["expense"]
+        t["top_expense_category"] = top
+    # Every month in range, with zeros for months without transactions; an
+    # open-ended range runs from the first to the last month with data
+    months = []
+    if series or series_from:
+        month = series_from if series_from else min(series)
+        end = last_month if last_month < 999912 else max(series)
+        while month <= end:
+            months.append(month)
+            month = month + 89 if month % 100 == 12 else month + 1
+    series = {m: series.get(m, {"income": 0.0, "expense": 0.0}) for m in months}
+    return {
+        "goal": goal[0] if goal else None,
+        "totals": totals,
+        "all_time": all_time,
+        "by_category": categories,
+        # Columnar, so a chart can take each list as an axis
+        "series": {
+            "month": [f"{m // 100:04d}-{m % 100:02d}" for m in months],
+            "income": [series[m]["income"] for m in months],
+            "expense": [series[m]["expense"] for m in months],
+            "balance": [series[m]["income"] - series[m]["expense"] for m in months],
+        },
+    }
+
+def get_flows(username: str, bucket: str) -> list:
+    """
+    (bucket start, income, expense) per day or month with transactions, in
+    date order. Days come from one walk of ix_transactions_user_date; months
+    from tx_rollup.
+    """
+    with _db(path=user_path(username)) as conn:
+        if bucket == "month":
+            rows = _fetchall(
+                conn,
+                """
+                SELECT month, SUM(CASE type WHEN 'income' THEN total ELSE 0 END),
+                       SUM(CASE type WHEN 'expense' THEN total ELSE 0 END)
+                FROM tx_rollup WHERE username = ? GROUP BY month ORDER BY month
+                """,
+                (username,),
+            )
+            return [(f"{m // 100:04d}-{m % 100:02d}-01", income, expense) for m, income, expense in rows]
+        return _fetchall(
+            conn,
+            """
+            SELECT date, SUM(CASE type WHEN 'income' THEN amount ELSE 0 END),
+                   SUM(CASE type WHEN 'expense' THEN amount ELSE 0 END)
+            FROM transactions WHERE username = ? GROUP BY date ORDER BY date
+            """,
+            (username,),
+        )
+
 # --- Transactions ---
-def add_transaction(username: str, t_type: str, category: str, amount: float, date: Optional[str] = None) -> int:
+def add_transaction(username: str, t_type: str, category: str, amount: float, date: Optional[str] = None,
+                    durable: bool = True) -> int:
     _ensure_dir()
     if date is None:
         date = datetime.today().strftime("%Y-%m-%d")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO transactions (username, type, category, amount, date) VALUES (?, ?, ?, ?, ?)",
-        (username, t_type, category, float(amount), date),
-    )
-    tx_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return tx_id
+    return _write(_insert_transaction, username, t_type, category, float(amount), date, durable=durable,
+                  path=user_path(username))
 
-def get_transactions(username: str) -> pd.DataFrame:
-    _ensure_dir()
-    conn = sqlite3.connect(DB_PATH)
+def _insert_transaction(conn: sqlite3.Connection, username: str, t_type: str, category: str, amount: float, date: str) -> int:
+    month = _month_bucket(date)
+    version = _bump_version(conn, username)
+    c = _execute(
+        conn,
+        "INSERT INTO transactions (username, type, category, amount, date, month, version) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (username, t_type, category, amount, date, month, version),
+    )
+    _rollup_add(conn, username, month, t_type, category, amount, 1)
+    return c.lastrowid
+
+def add_transactions_bulk(username: str, rows: list, durable: bool = True) -> int:
+    """
+    Insert many (type, category, amount, date) rows for `username` in one
+    transaction with a single executemany, folding them into tx_rollup per
+    bucket rather than per row. Rows must already be validated.
+    """
+    if not rows:
+        return 0
+    buckets = {}
+    params = []
+    for t_type, category, amount, date in rows:
+        month = _month_bucket(date)
+        params.append((username, t_type, category, float(amount), date, month))
+        key = (month, t_type, category)
+        total, count = buckets.get(key, (0.0, 0))
+        buckets[key] = (total + float(amount), count + 1)
+    return _write(_insert_transactions, username, params, buckets, durable=durable, path=user_path(username))
+
+def _insert_transactions(conn: sqlite3.Connection, username: str, params: list, buckets: dict) -> int:
+    version = _bump_version(conn, username)
+    _executemany(
+        conn,
+        "INSERT INTO transactions (username, type, category, amount, date, month, version) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [p + (version,) for p in params],
+    )
+    for (month, t_type, category), (total, count) in buckets.items():
+        _rollup_add(conn, username, month, t_type, category, total, count)
+    return len(params)
+
+TX_COLUMNS = ("id", "username", "type", "category", "amount", "date")
+
+def _tx_query(
+    username: str,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    t_type: Optional[str] = None,
+    category: Optional[str] = None,
+) -> tuple:
+    """SQL and params for a user's newest-first transaction listing."""
+    where = ["username = ?"]
+    params = [username]
+    if after is not None:
+        where.append("(date, id) < (?, ?)")
+        params.extend(after)
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    if t_type:
+        where.append("type = ?")
+        params.append(t_type)
+    if category is not None:
+        where.append("category = ?")
+        params.append(category)
+    sql = f"SELECT {', '.join(TX_COLUMNS)} FROM transactions WHERE {' AND '.join(where)} ORDER BY date DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return sql, params
+
+def get_transactions_page(username: str, limit: Optional[int] = None, after: Optional[tuple] = None, **filters) -> list:
+    """
+    Newest-first transactions for `username` as a list of dicts. `after` is the
+    (date, id) of the last row of the previous page: the next page starts right
+    below it (keyset pagination), so deep pages cost the same as the first one.
+    Filters: date_from, date_to, t_type, category.
+    """
+    sql, params = _tx_query(username, limit, after, **filters)
+    with _db(path=user_path(username)) as conn:
+        rows = _fetchall(conn, sql, params)
+    return [dict(zip(TX_COLUMNS, row)) for row in rows]
+
+def iter_transactions(username: str, batch_size: int = 500, **filters):
+    """
+    Yield a user's transactions newest-first as lists of up to `batch_size`
+    tuples (in TX_COLUMNS order), straight from the cursor. Memory stays flat
+    whatever the history size.
+    """
+    sql, params = _tx_query(username, **filters)
+    return _iter_rows(user_path(username), sql, params, batch_size)
+
+def _iter_rows(path: str, sql: str, params, batch_size: int):
+    """
+    Yield the rows of `sql` in batches of `batch_size`. Uses a connection
+    checked out of the stream pool rather than the thread's own, because a
+    streaming response may resume the generator on a different worker thread.
+    """
+    conn, generation = _checkout_stream_conn(path)
+    cur = None
+    seconds = 0.0
+    count = 0
     try:
-        df = pd.read_sql_query(
-            "SELECT * FROM transactions WHERE username = ? ORDER BY date DESC, id DESC", conn, params=(username,)
-        )
+        start = time.perf_counter()
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            seconds += time.perf_counter() - start
+            if not rows:
+                break
+            count += len(rows)
+            yield rows
+            start = time.perf_counter()
     finally:
-        conn.close()
-    return df
+        if _query_hooks:
+            # One report for the whole stream; time spent by the consumer is excluded
+            _observe(conn, sql, params, seconds, count)
+        if cur is not None:
+            # Ends the read even when the consumer stopped early
+            try:
+                cur.close()
+            except sqlite3.ProgrammingError:
+                pass  # close_connections() ran mid-stream
+        _return_stream_conn(path, conn, generation)
 
+def update_transaction(tx_id: int, username: str, t_type: str, category: str, amount: float, date: Optional[str] = None,
+                       durable: bool = True) -> bool:
+    if date is None:
+        date = datetime.today().strftime("%Y-%m-%d")
+    return _write(_update_transaction, tx_id, username, t_type, category, float(amount), date, durable=durable,
+                  path=user_path(username))
 
-def update_transaction(tx_id: int, username: str, t_type: str, category: str, amount: float, date: str) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "UPDATE transactions SET type=?, category=?, amount=?, date=? WHERE id=? AND username=?",
-        (t_type, category, float(amount), date, tx_id, username),
+def _update_transaction(conn: sqlite3.Connection, tx_id: int, username: str, t_type: str, category: str,
+                        amount: float, date: str) -> bool:
+    old = _fetchone(
+        conn, "SELECT month, type, category, amount FROM transactions WHERE id = ? AND username = ?", (tx_id, username)
     )
-    changed = c.rowcount
-    conn.commit()
-    conn.close()
-    return changed > 0
-
-def delete_transaction(tx_id: int, username: str) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM transactions WHERE id = ? AND username = ?", (tx_id, username))
-    changed = c.rowcount
-    conn.commit()
-    conn.close()
-    return changed > 0
-# ... (existing code in database.py) ...
+    if old is None:
+        return False
+    month = _month_bucket(date)
+    version = _bump_version(conn, username)
+    _execute(
+        conn,
+        "UPDATE transactions SET type=?, category=?, amount=?, date=?, month=?, version=? WHERE id=? AND username=?",
+        (t_type, category, amount, date, month, version, tx_id, username),
+    )
+    _rollup_add(conn, username, old[0], old[1], old[2], -old[3], -1)
+    _rollup_add(conn, username, month, t_type, category, amount, 1)
+    return True
 
-# --- User Goals ---
-def init_db():
-    # ... (keep your existing init_db code) ...
-    
-    # ADD THIS NEW TABLE CREATION inside your existing init_db function:
-    # (Or if you prefer, add it as a separate function, but putting it here ensures it runs on startup)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS user_goals (
-            username TEXT PRIMARY KEY,
-            goal_amount REAL NOT NULL
-        )
-        """
+def delete_transaction(tx_id: int, username: str, durable: bool = True) -> bool:
+    return _write(_delete_transaction, tx_id, username, durable=durable, path=user_path(username))
+
+def _delete_transaction(conn: sqlite3.Connection, tx_id: int, username: str) -> bool:
+    old = _fetchone(
+        conn, "SELECT month, type, category, amount FROM transactions WHERE id = ? AND username = ?", (tx_id, username)
     )
-    conn.commit()
-    conn.close()
+    if old is None:
+        return False
+    _execute(conn, "DELETE FROM transactions WHERE id = ?", (tx_id,))
+    _rollup_add(conn, username, old[0], old[1], old[2], -old[3], -1)
+    _execute(
+        conn,
+        "INSERT OR REPLACE INTO tx_tombstones (username, id, version) VALUES (?, ?, ?)",
+        (username, tx_id, _bump_version(conn, username)),
+    )
+    return True
+
+def get_changes(username: str, since: int = 0, batch_size: int = 500) -> dict:
+    """
+    Delta of `username`'s transactions after data version `since`:
+    {"version", "reset", "deleted": [ids], "upserts": batches of TX_COLUMNS
+    tuples}. since=0 is a full snapshot, newest first. "reset" is set when
+    `since` is ahead of the server (e.g. the database was recreated): the
+    client must drop what it has and apply the snapshot that comes with it.
 
+    The upserts are streamed like iter_transactions, after the version and
+    tombstones are read. A write landing in between is sent now and again
+    in the next delta (its version is above the returned one); applying
+    either twice is harmless, so passing "version" as the next `since`
+    never misses a change.
+    """
+    path = user_path(username)
+    with _db(path=path) as conn:
+        row = _fetchone(conn, "SELECT version FROM data_versions WHERE username = ?", (username,))
+        version = row[0] if row else 0
+        reset = since > version
+        deleted = []
+        if since > 0 and not reset:
+            deleted = [r[0] for r in _fetchall(
+                conn, "SELECT id FROM tx_tombstones WHERE username = ? AND version > ?", (username, since)
+            )]
+    if since <= 0 or reset:
+        sql, params = _tx_query(username)
+    else:
+        sql = f"SELECT {', '.join(TX_COLUMNS)} FROM transactions WHERE username = ? AND version > ?"
+        params = (username, since)
+    return {
+        "version": version,
+        "reset": reset,
+        "deleted": deleted,
+        "upserts": _iter_rows(path, sql, params, batch_size),
+    }
+
+# --- User Goals ---
 def get_user_goal(username: str) -> Optional[float]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT goal_amount FROM user_goals WHERE username = ?", (username,))
-    row = c.fetchone()
-    conn.close()
+    with _db(path=user_path(username)) as conn:
+        row = _fetchone(conn, "SELECT goal_amount FROM user_goals WHERE username = ?", (username,))
     if row:
         return row[0]
     return None # Returns None if no goal is set yet
 
 def set_user_goal(username: str, amount: float):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    _write(_set_user_goal, username, amount, path=user_path(username))
+
+def _set_user_goal(conn: sqlite3.Connection, username: str, amount: float):
     # INSERT OR REPLACE updates the row if username exists, or creates it if it doesn't
-    c.execute("INSERT OR REPLACE INTO user_goals (username, goal_amount) VALUES (?, ?)", (username, amount))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    _execute(conn, "INSERT OR REPLACE INTO user_goals (username, goal_amount) VALUES (?, ?)", (username, amount))
+    _bump_version(conn, username)
+
+# --- Exchange rates ---
+def load_exchange_rates() -> list:
+    """All persisted (pair, rate, source, fetched_at) rows."""
+    with _db() as conn:
+        return _fetchall(conn, "SELECT pair, rate, source, fetched_at FROM exchange_rates")
+
+def save_exchange_rate(pair: str, rate: float, source: str, fetched_at: float):
+    _write(_save_exchange_rate, pair, rate, source, fetched_at)
+
+def _save_exchange_rate(conn: sqlite3.Connection, pair: str, rate: float, source: str, fetched_at: float):
+    _execute(
+        conn,
+        "INSERT OR REPLACE INTO exchange_rates (pair, rate, source, fetched_at) VALUES (?, ?, ?, ?)",
+        (pair, rate, source, fetched_at),
+    )
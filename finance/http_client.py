@@ -0,0 +1,49 @@
+"""
+Shared outbound HTTP client for the API.
+
+One httpx.AsyncClient is created at startup and closed at shutdown, so
+upstream calls reuse pooled keep-alive connections (no DNS lookup or TLS
+handshake per request) and never occupy a threadpool slot while waiting.
+A per-host semaphore caps how many requests go to one upstream at once.
+"""
+import asyncio
+import os
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "64"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limits = {}
+
+async def start():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=min(5.0, HTTP_TIMEOUT_SECONDS)),
+            follow_redirects=True,
+        )
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    """GET through the shared client, waiting for a per-host slot first."""
+    if _client is None:
+        await start()
+    host = urlsplit(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    async with limit:
+        return await _client.get(url, **kwargs)
@@ -0,0 +1,278 @@
+"""
+Load generator for the finance API.
+
+Starts the API on a throwaway database (or targets --url), registers
+--users synthetic users, logs them in and replays a weighted mix of calls,
+either closed-loop from --concurrency workers or open-loop at --rps. Prints
+p50/p95/p99 latency and errors per route.
+
+    python loadtest.py --users 50 --concurrency 16 --duration 30
+    python loadtest.py --rps 200 --duration 60 --mix create=5,list=3,ai-tips=2
+    python loadtest.py --duration 20 --record trace.jsonl
+    python loadtest.py --replay trace.jsonl
+
+Ops: create, list, update, delete, ai-tips, goal (GET /me/goal) and
+goal-set (PUT /me/goal). update/delete fall back to create while the user
+has no transactions yet.
+
+With --rps latency is measured from when a request was scheduled, not from
+when a worker got round to sending it, so a backed-up server shows up in the
+tail instead of quietly lowering the offered load. Raise --concurrency if
+the run reports that it fell behind schedule.
+
+A trace is one JSON object per line: {"t": seconds from start, "user":
+index, "op": name, "body": payload}. Replaying sends the same ops for the
+same users at the same offsets; update/delete pick ids among the replaying
+run's own transactions. Lines that are not trace records are skipped, so
+any JSONL file can be passed.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import requests
+
+from bench import login, serve
+
+DEFAULT_MIX = "create=4,list=4,update=1,delete=1,ai-tips=2,goal=1,goal-set=1"
+OPS = ("create", "list", "update", "delete", "ai-tips", "goal", "goal-set")
+CATEGORIES = ("Food", "Rent", "Transport", "Salary", "Fun", "Health", "Bills")
+
+
+def parse_mix(spec: str) -> tuple:
+    """'create=4,list=2' -> (ops, weights)."""
+    ops, weights = [], []
+    for part in spec.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPS:
+            raise argparse.ArgumentTypeError(f"unknown op {op!r}, expected one of {', '.join(OPS)}")
+        ops.append(op)
+        weights.append(float(weight or 1))
+    return ops, weights
+
+def make_body(op: str, rng: random.Random):
+    if op in ("create", "update"):
+        income = rng.random() < 0.2
+        return {
+            "type": "income" if income else "expense",
+            "category": "Salary" if income else rng.choice(CATEGORIES),
+            "amount": round(rng.uniform(500, 3000) if income else rng.lognormvariate(3, 1), 2),
+            "date": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        }
+    if op == "goal-set":
+        return {"amount": rng.randrange(100, 5000, 50)}
+    return None
+
+
+class VirtualUser:
+    def __init__(self, headers: dict):
+        self.headers = headers
+        self.tx_ids = []
+        self.lock = threading.Lock()
+
+    def pick(self, rng: random.Random, remove: bool = False):
+        with self.lock:
+            if not self.tx_ids:
+                return None
+            i = rng.randrange(len(self.tx_ids))
+            if remove:
+                self.tx_ids[i], self.tx_ids[-1] = self.tx_ids[-1], self.tx_ids[i]
+                return self.tx_ids.pop()
+            return self.tx_ids[i]
+
+
+def plan(op: str, user: VirtualUser, rng: random.Random, body):
+    """Resolve an op to (op, route label, method, path, json body)."""
+    if op in ("update", "delete"):
+        tx_id = user.pick(rng, remove=op == "delete")
+        if tx_id is None:
+            op, body = "create", body or make_body("create", rng)
+        elif op == "update":
+            return op, "PUT /transactions/{id}", "PUT", f"/transactions/{tx_id}", body or make_body(op, rng)
+        else:
+            return op, "DELETE /transactions/{id}", "DELETE", f"/transactions/{tx_id}", None
+    if op == "create":
+        return op, "POST /transactions", "POST", "/transactions", body or make_body(op, rng)
+    if op == "list":
+        return op, "GET /transactions/me", "GET", "/transactions/me?limit=50", None
+    if op == "ai-tips":
+        return op, "GET /ai-tips", "GET", "/ai-tips", None
+    if op == "goal":
+        return op, "GET /me/goal", "GET", "/me/goal", None
+    if op == "goal-set":
+        return op, "PUT /me/goal", "PUT", "/me/goal", body or make_body(op, rng)
+    raise ValueError(f"unknown op {op!r}")
+
+
+# --- Schedules: iterators of (due offset or None, user index, op, body) ---
+def closed_loop(ops, weights, users: int, seconds: float, rng: random.Random):
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        op = rng.choices(ops, weights)[0]
+        yield None, rng.randrange(users), op, make_body(op, rng)
+
+def open_loop(ops, weights, users: int, seconds: float, rps: float, rng: random.Random):
+    for k in range(int(seconds * rps)):
+        op = rng.choices(ops, weights)[0]
+        yield k / rps, rng.randrange(users), op, make_body(op, rng)
+
+def read_trace(path: str) -> list:
+    records = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                rec = None
+            if not isinstance(rec, dict) or rec.get("op") not in OPS or "t" not in rec:
+                skipped += int(bool(line.strip()))
+                continue
+            records.append((float(rec["t"]), int(rec.get("user", 0)), rec["op"], rec.get("body")))
+    if skipped:
+        print(f"{path}: skipped {skipped} lines that are not trace records")
+    records.sort(key=lambda r: r[0])
+    return records
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.late = 0
+        self.lock = threading.Lock()
+
+    def add(self, route: str, seconds: float, error):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if error is not None:
+                self.errors[route][error] += 1
+
+    def report(self, elapsed: float):
+        total = sum(len(v) for v in self.latencies.values())
+        failed = sum(sum(e.values()) for e in self.errors.values())
+        print(f"{'route':28} {'count':>7} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for route in sorted(self.latencies):
+            lat = sorted(self.latencies[route])
+            errors = sum(self.errors.get(route, {}).values())
+            print(f"{route:28} {len(lat):7} {errors:7} {len(lat) / elapsed:8.1f} "
+                  f"{percentile(lat, 50) * 1000:8.1f} {percentile(lat, 95) * 1000:8.1f} "
+                  f"{percentile(lat, 99) * 1000:8.1f} {lat[-1] * 1000:8.1f}")
+        everything = sorted(x for v in self.latencies.values() for x in v)
+        if everything:
+            print(f"{'all':28} {total:7} {failed:7} {total / elapsed:8.1f} "
+                  f"{percentile(everything, 50) * 1000:8.1f} {percentile(everything, 95) * 1000:8.1f} "
+                  f"{percentile(everything, 99) * 1000:8.1f} {everything[-1] * 1000:8.1f}")
+        for route in sorted(self.errors):
+            kinds = ", ".join(f"{kind} x{n}" for kind, n in sorted(self.errors[route].items()))
+            print(f"errors {route}: {kinds}")
+        if self.late:
+            print(f"{self.late} requests started >10 ms behind schedule: raise --concurrency")
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def run(base: str, users: list, schedule, concurrency: int, seed: int, record: list = None) -> float:
+    """Drive `schedule` from `concurrency` threads; returns elapsed seconds."""
+    results = Results()
+    schedule = iter(schedule)
+    schedule_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        with requests.Session() as s:
+            while True:
+                with schedule_lock:
+                    item = next(schedule, None)
+                if item is None:
+                    return
+                due, user_index, op, body = item
+                user = users[user_index % len(users)]
+                op, route, method, path, body = plan(op, user, rng, body)
+                if due is None:
+                    sent = time.perf_counter()
+                else:
+                    sent = start + due
+                    delay = sent - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -0.01:
+                        with results.lock:
+                            results.late += 1
+                if record is not None:
+                    record.append({"t": round(sent - start, 4), "user": user_index, "op": op, "body": body})
+                error = None
+                try:
+                    r = s.request(method, base + path, json=body, headers=user.headers, timeout=30)
+                    if r.status_code >= 400:
+                        error = f"HTTP {r.status_code}"
+                    elif op == "create":
+                        with user.lock:
+                            user.tx_ids.append(r.json()["id"])
+                except requests.RequestException as e:
+                    error = type(e).__name__
+                results.add(route, time.perf_counter() - sent, error)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    results.report(elapsed)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running API instead of starting one on a temporary database")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, help="open-loop target rate (default: closed loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", help="write the requests sent to this JSONL trace")
+    parser.add_argument("--replay", help="send the requests of this JSONL trace instead of a generated mix")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.replay:
+        schedule = read_trace(args.replay)
+        if not schedule:
+            parser.error(f"{args.replay} contains no trace records")
+        users = max(r[1] for r in schedule) + 1
+    else:
+        ops, weights = args.mix
+        users = args.users
+        if args.rps:
+            schedule = open_loop(ops, weights, users, args.duration, args.rps, rng)
+        else:
+            schedule = closed_loop(ops, weights, users, args.duration, rng)
+
+    record = [] if args.record else None
+    with serve() if args.url is None else nullcontext(args.url.rstrip("/")) as base:
+        print(f"logging in {users} users at {base}")
+        sessions = [VirtualUser(login(base, f"load{i}")) for i in range(users)]
+        run(base, sessions, schedule, args.concurrency, args.seed, record)
+
+    if record is not None:
+        record.sort(key=lambda r: r["t"])
+        with open(args.record, "w", encoding="utf-8") as f:
+            for rec in record:
+                f.write(json.dumps(rec) + "\n")
+        print(f"recorded {len(record)} requests to {args.record}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Offline maintenance for the finance database. Run it with the API stopped
+and the API's environment (DATABASE_PATH, DB_SHARDS).
+
+    python manage.py migrate
+    DB_SHARDS=4 python manage.py reshard
+    python manage.py users
+
+migrate applies pending migrations and checks the shard layout, as the API
+does on startup. reshard splits an unsharded database into DB_SHARDS files
+(see database.reshard). users lists every user across the shards.
+"""
+import argparse
+import sys
+
+import database
+
+
+def cmd_migrate(args):
+    database.init_db()
+    print(f"{len(database.shard_paths())} file(s) up to date: {', '.join(database.shard_paths())}")
+
+def cmd_reshard(args):
+    copied = database.reshard(args.source)
+    if not copied:
+        print(f"already laid out for {database.DB_SHARDS} shards")
+    for path, users in copied.items():
+        print(f"{path}: {users} users")
+
+def cmd_users(args):
+    database.init_db()
+    for user in database.list_users():
+        print(f"{user['username']:24} {user['transactions']:10} {user['balance']:14,.2f}")
+
+COMMANDS = {"migrate": cmd_migrate, "reshard": cmd_reshard, "users": cmd_users}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--source", help="reshard: unsharded database to split (default: DATABASE_PATH)")
+    args = parser.parse_args()
+    try:
+        COMMANDS[args.command](args)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+In-process metrics for the API, exposed in the Prometheus text format at
+/metrics.
+
+- finance_http_requests_in_flight: requests being served right now
+- finance_http_request_duration_seconds{route, method, status}: time to the
+  last body byte, labelled with the route template (/transactions/{tx_id})
+- finance_sql_statement_duration_seconds{statement} and
+  finance_sql_rows{statement}: every statement run through the database.py
+  query helpers, labelled "<verb> <table>" (e.g. "select tx_rollup")
+- finance_rates_upstream_duration_seconds{outcome}: Yahoo fetches
+- finance_rates_cache_total{result}: rate lookups by hit / stale / miss
+
+Recording is a dict lookup, a bisect and a few additions under a lock per
+metric. METRICS=0 drops the HTTP middleware and the SQL hook, which are the
+per-request costs.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+ENABLED = os.getenv("METRICS", "1") != "0"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._render_values(items)
+        return lines
+
+    def _render_values(self, items: list) -> list:
+        return [f"{self.name}{self._label_text(labels)} {_number(value)}" for labels, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def add(self, amount: float, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        # Per label set: [count per bucket (+Inf last), sum]
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def _render_values(self, items: list) -> list:
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY = []
+
+HTTP_IN_FLIGHT = Gauge("finance_http_requests_in_flight", "HTTP requests currently being served.")
+HTTP_DURATION = Histogram("finance_http_request_duration_seconds", "HTTP request duration by route.",
+                          ("route", "method", "status"))
+SQL_DURATION = Histogram("finance_sql_statement_duration_seconds", "SQL statement duration (execute + fetch).",
+                         ("statement",), SQL_BUCKETS)
+SQL_ROWS = Histogram("finance_sql_rows", "Rows returned (queries) or changed (writes) per SQL statement.",
+                     ("statement",), ROW_BUCKETS)
+RATES_UPSTREAM = Histogram("finance_rates_upstream_duration_seconds", "Exchange-rate upstream fetch duration.",
+                           ("outcome",))
+RATES_CACHE = Counter("finance_rates_cache_total", "Exchange-rate cache lookups by result.", ("result",))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# --- SQL ---
+# Writes name their table right after the verb: a later FROM (a subquery in
+# SET, INSERT ... SELECT) belongs to another table
+_WRITE_TABLE = re.compile(
+    r"^\s*(INSERT|REPLACE|UPDATE|DELETE)\s+(?:OR\s+\w+\s+)?(?:INTO\s+|FROM\s+)?(?:\w+\.)?(\w+)", re.I
+)
+_SELECT_TABLE = re.compile(r"^\s*(SELECT)\b.*?\bFROM\s+(?:\w+\.)?(\w+)", re.I | re.S)
+
+@lru_cache(maxsize=512)
+def statement_label(sql: str) -> str:
+    """'<verb> <table>' for a statement, e.g. 'insert tx_rollup'; bare verb for BEGIN/COMMIT."""
+    m = _WRITE_TABLE.match(sql) or _SELECT_TABLE.match(sql)
+    if m:
+        return f"{m.group(1).lower()} {m.group(2).lower()}"
+    return sql.split(None, 1)[0].lower() if sql.strip() else "empty"
+
+def observe_sql(conn, sql: str, params, seconds: float, rows: int):
+    """database.py query hook."""
+    label = statement_label(sql)
+    SQL_DURATION.observe(seconds, label)
+    SQL_ROWS.observe(rows, label)
+
+
+# --- HTTP ---
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request from arrival to its last body
+    chunk (so streamed responses are measured in full).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+        recorded = [False]
+
+        def record():
+            if not recorded[0]:
+                recorded[0] = True
+                HTTP_IN_FLIGHT.add(-1)
+                # The router stores the matched route in the scope; unmatched paths share one label
+                route = scope.get("route")
+                HTTP_DURATION.observe(time.perf_counter() - start, getattr(route, "path", "unmatched"),
+                                      scope["method"], str(status[0]))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        HTTP_IN_FLIGHT.add(1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
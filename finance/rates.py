@@ -0,0 +1,175 @@
+"""
+Exchange rates scraped from Yahoo Finance behind a cache.
+
+- A rate younger than RATE_TTL_SECONDS is served from memory.
+- Up to RATE_STALE_SECONDS past that it is still served, while one
+  background fetch refreshes it (stale-while-revalidate).
+- Concurrent requests for a pair that is being fetched wait for that one
+  fetch instead of starting their own (single-flight).
+- Every fetched rate is written to the exchange_rates table and loaded
+  back on startup.
+
+Fetches go through the shared async client in http_client.py; the cache
+lives on the event loop, so it needs no locks.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from bs4 import BeautifulSoup
+from starlette.concurrency import run_in_threadpool
+
+import database
+import http_client
+import metrics
+
+RATES_UPSTREAM = os.getenv("RATES_UPSTREAM", "https://finance.yahoo.com").rstrip("/")
+RATE_TTL_SECONDS = float(os.getenv("RATE_TTL_SECONDS", "300"))
+RATE_STALE_SECONDS = float(os.getenv("RATE_STALE_SECONDS", "3600"))
+
+# Headers to mimic a real browser slightly better
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+class RateNotFound(LookupError):
+    """The upstream page loaded but contained no rate."""
+
+def parse_rate(html: str) -> float:
+    soup = BeautifulSoup(html, "html.parser")
+    # Yahoo Finance usually puts the rate in a <fin-streamer> tag
+    rate_tag = soup.find("fin-streamer", {"data-field": "regularMarketPrice"})
+    if not rate_tag:
+        raise RateNotFound("Could not parse specific rate tag")
+    return float(rate_tag.text.replace(",", ""))
+
+# Currencies offered by the converter. Every cross rate between them is
+# derived from one quote per currency against PIVOT.
+PIVOT = "USD"
+CURRENCIES = ("USD", "EUR", "GBP", "JPY", "CAD", "AUD", "CHF", "CNY", "INR",
+              "BTC", "ETH", "SOL", "DOGE", "XRP", "ADA", "DOT")
+CRYPTO = {"BTC", "ETH", "SOL", "DOGE", "XRP", "ADA", "DOT"}
+
+def quote_symbol(frm: str, to: str) -> str:
+    # Yahoo lists crypto as BTC-USD and fiat pairs as EURUSD=X
+    return f"{frm}-{to}" if frm in CRYPTO else f"{frm}{to}=X"
+
+async def fetch_yahoo_rate(frm: str, to: str) -> float:
+    res = await http_client.get(f"{RATES_UPSTREAM}/quote/{quote_symbol(frm, to)}", headers=HEADERS)
+    res.raise_for_status()
+    # Quote pages are large; parse them off the event loop
+    return await run_in_threadpool(parse_rate, res.text)
+
+
+class RateCache:
+    def __init__(self, fetch: Callable[[str, str], Awaitable[float]], ttl: float = RATE_TTL_SECONDS,
+                 stale: float = RATE_STALE_SECONDS, source: str = "Yahoo Finance"):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale = stale
+        self.source = source
+        self._entries = {}   # pair -> (rate, fetched_at)
+        self._inflight = {}  # pair -> asyncio.Task of (rate, fetched_at)
+
+    def load(self):
+        """Warm the cache from the exchange_rates table."""
+        for pair, rate, _, fetched_at in database.load_exchange_rates():
+            self._entries[pair] = (rate, fetched_at)
+
+    async def get(self, frm: str, to: str) -> dict:
+        """
+        Rate for frm->to as {"rate", "fetched_at", "stale"}. Raises the fetch
+        error only when there is no usable cached value at all.
+        """
+        pair = f"{frm}{to}"
+        hit, entry = self._lookup(pair, frm, to)
+        if hit is not None:
+            metrics.RATES_CACHE.inc("stale" if hit["stale"] else "hit")
+            return hit
+        metrics.RATES_CACHE.inc("miss")
+        return await self._wait(self._fetch(pair, frm, to), entry)
+
+    async def get_many(self, pairs: list) -> dict:
+        """
+        Like get() for many (frm, to) pairs at once; misses are fetched
+        concurrently. Returns {(frm, to): result or None when unavailable}.
+        """
+        results = await asyncio.gather(*(self.get(frm, to) for frm, to in pairs), return_exceptions=True)
+        return {pair: None if isinstance(r, Exception) else r for pair, r in zip(pairs, results)}
+
+    def _lookup(self, pair: str, frm: str, to: str) -> tuple:
+        """(result, entry): result is set when the cache can answer now."""
+        entry = self._entries.get(pair)
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age < self.ttl:
+                return self._result(entry, stale=False), entry
+            if age < self.ttl + self.stale:
+                self._fetch(pair, frm, to)
+                return self._result(entry, stale=True), entry
+        return None, entry
+
+    def _fetch(self, pair: str, frm: str, to: str) -> asyncio.Task:
+        task = self._inflight.get(pair)
+        if task is None:
+            task = self._inflight[pair] = asyncio.create_task(self._run(pair, frm, to))
+            # A background refresh may fail with nobody awaiting it
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _run(self, pair: str, frm: str, to: str) -> tuple:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            entry = (await self.fetch(frm, to), time.time())
+            outcome = "ok"
+        finally:
+            self._inflight.pop(pair, None)
+            metrics.RATES_UPSTREAM.observe(time.perf_counter() - start, outcome)
+        self._entries[pair] = entry
+        await run_in_threadpool(database.save_exchange_rate, pair, entry[0], self.source, entry[1])
+        return entry
+
+    async def _wait(self, task: asyncio.Task, entry: Optional[tuple]) -> dict:
+        try:
+            # shield: a waiter going away must not cancel the fetch others share
+            return self._result(await asyncio.shield(task), stale=False)
+        except Exception:
+            if entry is not None:
+                # Upstream is down: an old rate beats no rate
+                return self._result(entry, stale=True)
+            raise
+
+    @staticmethod
+    def _result(entry: tuple, stale: bool) -> dict:
+        return {"rate": entry[0], "fetched_at": entry[1], "stale": stale}
+
+
+service = RateCache(fetch_yahoo_rate)
+
+async def rates_for(base: str, symbols: tuple = CURRENCIES) -> dict:
+    """
+    Units of each symbol per 1 `base`, triangulated through PIVOT: one quote
+    per currency (X -> PIVOT) instead of one per pair. Currencies whose quote
+    is unavailable are listed under "missing".
+    """
+    wanted = list(dict.fromkeys(symbols + (base,)))
+    quotes = await service.get_many([(c, PIVOT) for c in wanted if c != PIVOT])
+    # Value of one unit of each currency in PIVOT
+    in_pivot = {PIVOT: 1.0}
+    oldest = time.time()
+    for (c, _), quote in quotes.items():
+        if quote is not None and quote["rate"] > 0:
+            in_pivot[c] = quote["rate"]
+            oldest = min(oldest, quote["fetched_at"])
+    if base not in in_pivot:
+        return {"base": base, "pivot": PIVOT, "rates": {}, "missing": list(symbols), "as_of": None}
+    base_value = in_pivot[base]
+    return {
+        "base": base,
+        "pivot": PIVOT,
+        "rates": {c: base_value / in_pivot[c] for c in symbols if c in in_pivot},
+        "missing": [c for c in symbols if c not in in_pivot],
+        "as_of": oldest,
+    }
@@ -0,0 +1,216 @@
+"""
+Synthetic data for scale testing: fills the finance database with --users
+users and about --transactions transactions between --start and --end.
+
+    python seed.py --users 1000 --transactions 10000000 --db /tmp/finance-10m.db
+    DB_SHARDS=8 python seed.py --users 5000 --transactions 2000000
+
+Each user gets a monthly salary on a fixed payday, rent and recurring bills
+on fixed days, and day-to-day spending whose category mix and amounts follow
+the season (travel in summer, gifts and shopping in December, heating bills
+in winter). Amounts are log-normal around per-category medians. Users are
+seed000000, seed000001, ... with password "pw".
+
+The output depends only on --seed and the size arguments, so two runs give
+byte-identical data. Rows go straight into SQLite with executemany: the
+transaction indexes are dropped for the load and rebuilt afterwards, and the
+rollup tables are recomputed in SQL at the end (database.rebuild_rollups).
+Meant for throwaway databases: by default it writes to DATABASE_PATH.
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import database
+
+CHUNK_ROWS = 200_000
+
+# category: (median amount, sigma of log amount, weight per month 1..12)
+SPEND = {
+    "Groceries":     (45, 0.5, (1.0,) * 11 + (1.25,)),
+    "Dining":        (25, 0.6, (0.8, 0.8, 1, 1, 1.1, 1.2, 1.2, 1.2, 1, 1, 1, 1.4)),
+    "Transport":     (15, 0.5, (1,) * 12),
+    "Shopping":      (60, 0.9, (1.2, 0.7, 0.8, 0.9, 0.9, 1, 1, 1, 1, 1, 1.8, 2.2)),
+    "Entertainment": (30, 0.7, (0.8, 0.8, 1, 1, 1, 1.2, 1.3, 1.3, 1, 1, 1, 1.2)),
+    "Health":        (50, 0.8, (1.3, 1.2, 1, 1, 0.9, 0.8, 0.8, 0.8, 1, 1, 1.1, 1.2)),
+    "Travel":        (300, 0.8, (0.3, 0.3, 0.5, 0.7, 0.8, 2.5, 3.5, 3.0, 0.8, 0.5, 0.3, 1.0)),
+    "Gifts":         (50, 0.8, (0.2, 0.5, 0.3, 0.3, 0.5, 0.3, 0.3, 0.3, 0.3, 0.3, 0.8, 5.0)),
+}
+SPEND_WEIGHTS = {"Groceries": 30, "Dining": 15, "Transport": 15, "Shopping": 10, "Entertainment": 8,
+                 "Health": 4, "Travel": 2, "Gifts": 2}
+# Utilities follow heating: winter bills are higher
+UTILITY_SEASON = (1.5, 1.4, 1.2, 1.0, 0.8, 0.8, 0.9, 0.9, 0.8, 1.0, 1.2, 1.4)
+
+
+class Calendar:
+    """Every day between start and end, precomputed once for all users."""
+    def __init__(self, start: date, end: date):
+        self.days = []
+        self.months = []  # (YYYYMM, first day index, last day index)
+        d = start
+        while d <= end:
+            bucket = d.year * 100 + d.month
+            if not self.months or self.months[-1][0] != bucket:
+                self.months.append([bucket, len(self.days), len(self.days)])
+            self.months[-1][2] = len(self.days)
+            self.days.append((d.isoformat(), bucket, d.month, d.day))
+            d += timedelta(days=1)
+        # Spending is seasonal: a day's weight is the weighted sum over categories
+        day_weight = [sum(SPEND_WEIGHTS[c] * SPEND[c][2][m - 1] for c in SPEND) for _, _, m, _ in self.days]
+        self.cum_day_weights = list(_accumulate(day_weight))
+        names = list(SPEND)
+        self.category_names = names
+        self.category_cum_weights = [
+            list(_accumulate(SPEND_WEIGHTS[c] * SPEND[c][2][m - 1] for c in names)) for m in range(1, 13)
+        ]
+
+    def day_in_month(self, month_index: int, day_of_month: int) -> tuple:
+        """The given day of a month, clamped to the month's last day (and to the range)."""
+        _, first, last = self.months[month_index]
+        return self.days[min(first + day_of_month - 1, last)]
+
+def _accumulate(values):
+    total = 0.0
+    for v in values:
+        total += v
+        yield total
+
+
+def user_rows(username: str, n: int, cal: Calendar, rng: random.Random) -> list:
+    """
+    About `n` (username, type, category, amount, date, month, version) rows
+    for one user. version is 1: a fresh user's first change.
+    """
+    salary = round(rng.lognormvariate(math.log(3000), 0.35), -1)
+    payday = rng.choice((1, 15, 25, 28))
+    rent = round(salary * rng.uniform(0.25, 0.4), -1)
+    bills = [("Utilities", rng.lognormvariate(math.log(110), 0.3), rng.randrange(5, 20), True),
+             ("Internet", rng.choice((29.99, 39.99, 49.99)), rng.randrange(1, 28), False),
+             ("Insurance", round(rng.uniform(40, 160), 2), rng.randrange(1, 28), False)]
+    bills += [("Subscriptions", rng.choice((4.99, 9.99, 11.99, 15.99)), rng.randrange(1, 28), False)
+              for _ in range(rng.randrange(0, 4))]
+    freelancer = rng.random() < 0.2
+    bonus = rng.random() < 0.5
+
+    recurring = []
+    for mi, (bucket, _, _) in enumerate(cal.months):
+        d, _, month, _ = cal.day_in_month(mi, payday)
+        recurring.append((username, "income", "Salary", salary, d, bucket, 1))
+        if bonus and month == 12:
+            recurring.append((username, "income", "Bonus", round(salary * rng.uniform(0.3, 1.0), 2), d, bucket, 1))
+        if freelancer and rng.random() < 0.4:
+            d = cal.day_in_month(mi, rng.randrange(1, 29))[0]
+            recurring.append((username, "income", "Freelance", round(rng.lognormvariate(math.log(400), 0.6), 2), d, bucket, 1))
+        d = cal.day_in_month(mi, 1)[0]
+        recurring.append((username, "expense", "Rent", rent, d, bucket, 1))
+        for category, amount, day, seasonal in bills:
+            d = cal.day_in_month(mi, day)[0]
+            if seasonal:
+                amount = amount * UTILITY_SEASON[month - 1] * rng.uniform(0.9, 1.1)
+            recurring.append((username, "expense", category, round(amount, 2), d, bucket, 1))
+    if len(recurring) >= n:
+        # Small histories keep only the latest months of recurring rows
+        return recurring[len(recurring) - n:]
+
+    rows = recurring
+    spend = n - len(recurring)
+    # Draw the days first, then each calendar month's categories in one call:
+    # per-row choices() dominated the generation time
+    by_month = {}
+    for day in rng.choices(cal.days, cum_weights=cal.cum_day_weights, k=spend):
+        by_month.setdefault(day[2], []).append(day)
+    gauss = rng.gauss
+    for month in sorted(by_month):
+        days = by_month[month]
+        categories = rng.choices(cal.category_names, cum_weights=cal.category_cum_weights[month - 1], k=len(days))
+        for (d, bucket, _, _), category in zip(days, categories):
+            median, sigma, _ = SPEND[category]
+            rows.append((username, "expense", category, round(median * math.exp(sigma * gauss()), 2), d, bucket, 1))
+    return rows
+
+
+def _load(path: str, users: list, cal: Calendar, seed: int) -> int:
+    """Insert (index, username, transaction count) users and their transactions into one database file."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    # A seed database can be regenerated, so skip fsyncs during the load
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions' AND sql IS NOT NULL"
+    ).fetchall()
+    inserted = 0
+    try:
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO users (username, password) VALUES (?, 'pw')",
+                             [(username,) for _, username, _ in users])
+            for name, _ in indexes:
+                conn.execute(f"DROP INDEX {name}")
+        batch = []
+        for position, (index, username, n) in enumerate(users):
+            # One generator per user, so the data does not depend on sharding or chunking
+            batch += user_rows(username, n, cal, random.Random(seed * 1_000_003 + index))
+            if len(batch) >= CHUNK_ROWS or position == len(users) - 1:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO transactions (username, type, category, amount, date, month, version) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                inserted += len(batch)
+                batch = []
+    finally:
+        # Sorting once is far cheaper than maintaining the indexes row by row
+        with conn:
+            for _, sql in indexes:
+                conn.execute(sql)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+    database.rebuild_rollups(path)
+    return inserted
+
+def split_sizes(total: int, users: int, rng: random.Random) -> list:
+    """Per-user transaction counts summing to `total`, skewed like real activity (a few heavy users)."""
+    weights = [rng.paretovariate(2.5) for _ in range(users)]
+    scale = total / sum(weights)
+    sizes = [int(w * scale) for w in weights]
+    for i in range(total - sum(sizes)):
+        sizes[i % users] += 1
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2022, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="database file (default: DATABASE_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        database.DB_PATH = args.db
+    database.init_db()
+
+    started = time.perf_counter()
+    cal = Calendar(args.start, args.end)
+    sizes = split_sizes(args.transactions, args.users, random.Random(args.seed))
+    by_path = {}
+    for i, n in enumerate(sizes):
+        username = f"seed{i:06d}"
+        by_path.setdefault(database.user_path(username), []).append((i, username, n))
+    total = 0
+    for path, users in by_path.items():
+        total += _load(path, users, cal, args.seed)
+    elapsed = time.perf_counter() - started
+    size = sum(os.path.getsize(p) for p in by_path)
+    print(f"{total} transactions for {args.users} users in {elapsed:.1f} s "
+          f"({total / elapsed:,.0f} rows/s), {size / 1e6:.0f} MB across {len(by_path)} file(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Chart-ready time series for GET /me/series.
+
+Daily or monthly flows from database.get_flows are bucketed (day, week
+starting Monday, or month), zero-filled so every bucket in the range is
+present, accumulated into a running balance and then downsampled with
+Largest-Triangle-Three-Buckets (LTTB) to at most `points` per line. LTTB
+keeps the first and last points and, from each slice of the rest, the one
+forming the largest triangle with its neighbours, so spikes and turns
+survive while a decade of days becomes a few hundred points.
+"""
+from datetime import date, timedelta
+
+import database
+
+BUCKETS = ("day", "week", "month")
+LINES = ("balance", "income", "expense")
+
+
+def lttb(values: list, threshold: int) -> list:
+    """Indices of at most `threshold` points of evenly spaced `values` chosen by LTTB."""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next slice: the third corner of the triangle
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = (start + end - 1) / 2
+        avg_y = sum(values[start:end]) / (end - start)
+        # The point of this slice with the largest triangle (a, point, average)
+        ax, ay = a, values[a]
+        best, best_area = start, -1.0
+        for j in range(int(i * every) + 1, start):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def build(username: str, bucket: str, points: int) -> dict:
+    """
+    {"bucket", "buckets": count before downsampling, "series": {line: {"x", "y"}}}
+    for the balance, income and expense lines.
+    """
+    flows = {}
+    for day, income, expense in database.get_flows(username, "month" if bucket == "month" else "day"):
+        start = _bucket_start(date.fromisoformat(day), bucket)
+        entry = flows.setdefault(start, [0.0, 0.0])
+        entry[0] += income
+        entry[1] += expense
+
+    xs = []
+    lines = {line: [] for line in LINES}
+    if flows:
+        current, last = min(flows), max(flows)
+        balance = 0.0
+        while current <= last:
+            income, expense = flows.get(current, (0.0, 0.0))
+            balance += income - expense
+            xs.append(current.isoformat()[:7] if bucket == "month" else current.isoformat())
+            lines["balance"].append(round(balance, 2))
+            lines["income"].append(round(income, 2))
+            lines["expense"].append(round(expense, 2))
+            current = _next_bucket(current, bucket)
+
+    series = {}
+    for line, ys in lines.items():
+        keep = lttb(ys, points)
+        series[line] = {"x": [xs[i] for i in keep], "y": [ys[i] for i in keep]}
+    return {"bucket": bucket, "buckets": len(xs), "series": series}
@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+# The finance modules import each other by their bare names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Never the real data/finance.db: every test gets its own file (see fresh_db)
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "finance.db")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """A migrated, empty database at a temporary path."""
+    database.close_connections()
+    database.DB_PATH = str(tmp_path / "finance.db")
+    database.init_db()
+    yield database
+    database.close_connections()
+
+@pytest.fixture
+def client(fresh_db):
+    """The API on the fresh database, over the in-process transport."""
+    import api_client
+
+    session = api_client.InProcessSession()
+    yield session
+    session.close()
+
+@pytest.fixture
+def login(client):
+    """login(username) -> Authorization headers for a newly registered user."""
+    def login(username: str, password: str = "pw") -> dict:
+        client.request("POST", "/auth/register", json={"username": username, "password": password})
+        r = client.request("POST", "/auth/login", json={"username": username, "password": password})
+        assert r.status_code == 200, r.text
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return login
@@ -0,0 +1,47 @@
+"""Both api_client transports give the same statuses and bodies for the same calls."""
+import pytest
+
+import api_client
+import bench
+import database
+
+
+@pytest.fixture
+def transports(fresh_db):
+    # Same database and JWT_SECRET on both sides, so tokens work on either
+    database.close_connections()
+    inprocess = api_client.InProcessSession()
+    with bench.serve(db_path=database.DB_PATH) as base:
+        yield {"http": (api_client.http_session(), base), "inprocess": (inprocess, "http://finance.inprocess")}
+    inprocess.close()
+
+def call(transports, method, path, **kwargs):
+    out = {}
+    for name, (session, base) in transports.items():
+        r = session.request(method, base + path, timeout=10, **kwargs)
+        out[name] = (r.status_code, r.json())
+    return out
+
+
+def test_bad_token_is_rejected_the_same_way(transports):
+    out = call(transports, "GET", "/me/summary", headers={"Authorization": "Bearer not-a-token"})
+    assert out["http"] == out["inprocess"] == (401, {"detail": "Token invalid or expired"})
+    out = call(transports, "GET", "/me/summary")
+    assert out["http"] == out["inprocess"] == (401, {"detail": "Authorization header missing"})
+
+def test_responses_match(transports):
+    session, base = transports["http"]
+    session.post(f"{base}/auth/register", json={"username": "ann", "password": "pw"}, timeout=10)
+    token = session.post(f"{base}/auth/login", json={"username": "ann", "password": "pw"}, timeout=10).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    for amount, date in ((120.0, "2024-05-01"), (30.5, "2024-06-02")):
+        r = session.post(f"{base}/transactions", headers=headers, timeout=10,
+                         json={"type": "expense", "category": "Food", "amount": amount, "date": date})
+        assert r.status_code == 200
+
+    for path in ("/me/summary", "/transactions/me", "/me/goal", "/ai-tips"):
+        out = call(transports, "GET", path, headers=headers)
+        assert out["http"] == out["inprocess"], path
+        assert out["http"][0] == 200
+    out = call(transports, "POST", "/transactions", headers=headers, json={"type": "expense", "amount": "x"})
+    assert out["http"] == out["inprocess"] and out["http"][0] == 422
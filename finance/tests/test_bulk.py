@@ -0,0 +1,81 @@
+"""POST /transactions/bulk: CSV records parsed across lines and chunks, per-record errors."""
+import json
+
+import api
+import bulk
+import database
+
+
+def upload(client, headers, body: str, content_type: str = "text/csv") -> dict:
+    r = client.request("POST", "/transactions/bulk", data=body.encode(),
+                       headers={**headers, "Content-Type": content_type})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def categories(username: str) -> list:
+    return sorted(row["category"] for row in database.get_transactions_page(username))
+
+
+def test_quoted_fields_keep_blank_lines_and_span_record_chunks(client, login, monkeypatch):
+    monkeypatch.setattr(api, "BULK_CHUNK_ROWS", 2)
+    headers = login("ann")
+    body = (
+        "type,category,amount,date\n"
+        "expense,Food,1.5,2024-05-01\n"
+        'expense,"Multi\n\nline\nnote",2.5,2024-05-02\n'
+        "\n"
+        'income,"a, b",3,2024-05-03\n'
+        'expense,"x\n""quoted""",4,2024-05-04\n'
+        "expense,Last,5,2024-05-05"
+    )
+    assert upload(client, headers, body) == {"inserted": 5, "failed": 0, "errors": []}
+    assert categories("ann") == sorted(["Food", "Multi\n\nline\nnote", "a, b", 'x\n"quoted"', "Last"])
+
+def test_records_split_across_body_chunks():
+    text = 'type,category,amount\nexpense,"one\n\ntwo",1\nincome,café,2\n'.encode()
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+    records = list(bulk.csv_records(bulk.text_lines(chunks)))
+    assert records == [
+        (2, {"type": "expense", "category": "one\n\ntwo", "amount": "1"}),
+        (5, {"type": "income", "category": "café", "amount": "2"}),
+    ]
+
+def test_unterminated_quote_is_reported(client, login):
+    headers = login("ann")
+    body = (
+        "type,category,amount,date\n"
+        "expense,Food,1.5,2024-05-01\n"
+        "expense,Food,abc,2024-05-01\n"
+        'expense,"never closed,2,2024-05-02\n'
+        "income,Pay,100,2024-05-03\n"
+    )
+    result = upload(client, headers, body)
+    assert result["inserted"] == 1
+    assert result["errors"] == [
+        {"line": 3, "error": "amount must be a number"},
+        {"line": 4, "error": "unterminated quoted field"},
+    ]
+
+def test_ndjson_lines_are_reported_by_line(client, login):
+    headers = login("ann")
+    lines = [
+        json.dumps({"type": "expense", "category": "Food", "amount": 2, "date": "2024-05-01"}),
+        "",
+        "{not json",
+        json.dumps({"type": 1, "amount": 2}),
+        json.dumps({"type": "income", "amount": 10, "date": "2024-05-02"}),
+    ]
+    result = upload(client, headers, "\n".join(lines), "application/x-ndjson")
+    assert result["inserted"] == 2
+    assert result["errors"] == [
+        {"line": 3, "error": "invalid JSON"},
+        {"line": 4, "error": "type must be a string"},
+    ]
+
+def test_bad_header_refuses_the_upload(client, login):
+    headers = login("ann")
+    r = client.request("POST", "/transactions/bulk", data=b"category,date\nFood,2024-05-01\n",
+                       headers={**headers, "Content-Type": "text/csv"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "CSV header is missing: amount, type"
+    assert categories("ann") == []
@@ -0,0 +1,54 @@
+"""Delta sync over GET /transactions/changes: snapshot, upserts, tombstones, reset."""
+
+
+def changes(client, headers, since):
+    r = client.request("GET", "/transactions/changes", headers=headers, params={"since": since})
+    assert r.status_code == 200
+    return r.json()
+
+def add(client, headers, amount, date="2024-05-01"):
+    r = client.request("POST", "/transactions", headers=headers,
+                       json={"type": "expense", "category": "Food", "amount": amount, "date": date})
+    return r.json()["id"]
+
+
+def test_insert_update_delete_each_show_up_in_the_next_delta(client, login):
+    headers = login("ann")
+    first = add(client, headers, 10.0)
+    snapshot = changes(client, headers, 0)
+    assert [row["id"] for row in snapshot["upserts"]] == [first]
+    assert snapshot["deleted"] == [] and not snapshot["reset"]
+    version = snapshot["version"]
+    assert changes(client, headers, version) == {"version": version, "reset": False, "deleted": [], "upserts": []}
+
+    second = add(client, headers, 20.0, "2024-06-01")
+    delta = changes(client, headers, version)
+    assert [(row["id"], row["amount"]) for row in delta["upserts"]] == [(second, 20.0)]
+    assert delta["deleted"] == [] and delta["version"] > version
+    version = delta["version"]
+
+    client.request("PUT", f"/transactions/{first}", headers=headers,
+                   json={"type": "income", "category": "Pay", "amount": 99.0, "date": "2024-05-02"})
+    delta = changes(client, headers, version)
+    assert [(row["id"], row["type"], row["amount"]) for row in delta["upserts"]] == [(first, "income", 99.0)]
+    assert delta["deleted"] == []
+    version = delta["version"]
+
+    client.request("DELETE", f"/transactions/{second}", headers=headers)
+    delta = changes(client, headers, version)
+    assert delta["upserts"] == [] and delta["deleted"] == [second]
+    assert delta["version"] > version
+
+def test_snapshot_is_newest_first_and_only_the_users_rows(client, login):
+    ann, bob = login("ann"), login("bob")
+    ids = [add(client, ann, float(i), f"2024-0{i}-01") for i in range(1, 6)]
+    add(client, bob, 1.0)
+    snapshot = changes(client, ann, 0)
+    assert [row["id"] for row in snapshot["upserts"]] == ids[::-1]
+    assert {row["username"] for row in snapshot["upserts"]} == {"ann"}
+
+def test_since_ahead_of_the_server_resets(client, login):
+    headers = login("ann")
+    tx_id = add(client, headers, 10.0)
+    delta = changes(client, headers, 1000)
+    assert delta["reset"] and [row["id"] for row in delta["upserts"]] == [tx_id]
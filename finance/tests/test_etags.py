@@ -0,0 +1,86 @@
+"""Conditional GETs: ETags, 304s and what must change them."""
+import pytest
+
+
+def add(client, headers, amount=10.0, date="2024-05-01"):
+    r = client.request("POST", "/transactions", headers=headers,
+                       json={"type": "expense", "category": "Food", "amount": amount, "date": date})
+    assert r.status_code == 200
+    return r.json()["id"]
+
+def etag(client, headers, path, **params):
+    r = client.request("GET", path, headers=headers, params=params)
+    assert r.status_code == 200
+    return r.headers["ETag"]
+
+
+@pytest.mark.parametrize("path", ["/me/summary", "/me/goal", "/ai-tips", "/me/dashboard", "/transactions/me"])
+def test_matching_if_none_match_is_answered_with_an_empty_304(client, login, path):
+    headers = login("ann")
+    add(client, headers)
+    tag = etag(client, headers, path)
+    r = client.request("GET", path, headers={**headers, "If-None-Match": tag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["ETag"] == tag
+    r = client.request("GET", path, headers={**headers, "If-None-Match": 'W/"0-00000000"'})
+    assert r.status_code == 200
+
+def test_json_and_ndjson_get_different_etags(client, login):
+    headers = login("ann")
+    add(client, headers)
+    as_json = etag(client, headers, "/transactions/me")
+    as_ndjson = etag(client, {**headers, "Accept": "application/x-ndjson"}, "/transactions/me")
+    assert as_json != as_ndjson
+    assert etag(client, headers, "/transactions/me", format="ndjson") != as_json
+    # The JSON tag does not revalidate an NDJSON request
+    r = client.request("GET", "/transactions/me",
+                       headers={**headers, "Accept": "application/x-ndjson", "If-None-Match": as_json})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+
+def test_dashboard_etag_follows_the_period(client, login):
+    headers = login("ann")
+    add(client, headers)
+    tags = {etag(client, headers, "/me/dashboard", period=period, month="2024-05") for period in ("month", "year", "all")}
+    assert len(tags) == 3
+    assert etag(client, headers, "/me/dashboard", period="month", month="2024-06") not in tags
+
+def test_every_write_changes_the_etag(client, login):
+    headers = login("ann")
+    tx_id = add(client, headers)
+    writes = [
+        ("POST", "/transactions", {"json": {"type": "income", "amount": 5.0, "date": "2024-05-02"}}),
+        ("PUT", f"/transactions/{tx_id}", {"json": {"type": "expense", "amount": 6.0, "date": "2024-05-03"}}),
+        ("DELETE", f"/transactions/{tx_id}", {}),
+        ("PUT", "/me/goal", {"json": {"amount": 500.0}}),
+        ("POST", "/transactions/bulk", {"data": "type,amount,date\nexpense,1.5,2024-05-04\n",
+                                        "headers": {"Content-Type": "text/csv"}}),
+    ]
+    seen = {etag(client, headers, "/me/summary")}
+    for method, path, kwargs in writes:
+        extra = kwargs.pop("headers", {})
+        r = client.request(method, path, headers={**headers, **extra}, **kwargs)
+        assert r.status_code == 200, (method, path, r.text)
+        tag = etag(client, headers, "/me/summary")
+        assert tag not in seen, (method, path)
+        seen.add(tag)
+
+def test_other_users_writes_keep_the_etag(client, login):
+    ann, bob = login("ann"), login("bob")
+    tag = etag(client, ann, "/me/summary")
+    add(client, bob)
+    assert etag(client, ann, "/me/summary") == tag
+
+def test_304_for_a_page_keeps_its_cursor(client, login):
+    headers = login("ann")
+    for day in range(1, 6):
+        add(client, headers, date=f"2024-05-0{day}")
+    first = client.request("GET", "/transactions/me", headers=headers, params={"limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+    r = client.request("GET", "/transactions/me", params={"limit": 2},
+                       headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["X-Next-Cursor"] == cursor
+    following = client.request("GET", "/transactions/me", headers=headers, params={"limit": 2, "after": cursor})
+    assert [row["date"] for row in following.json()] == ["2024-05-03", "2024-05-02"]
@@ -0,0 +1,26 @@
+"""metrics.statement_label: the '<verb> <table>' label of each SQL statement."""
+import pytest
+
+import metrics
+
+
+@pytest.mark.parametrize("sql, label", [
+    ("SELECT version FROM data_versions WHERE username = ?", "select data_versions"),
+    ("\n  select id\n  from transactions where username = ?", "select transactions"),
+    ("INSERT INTO transactions (username, type) VALUES (?, ?)", "insert transactions"),
+    ("INSERT OR REPLACE INTO user_goals (username, goal_amount) VALUES (?, ?)", "insert user_goals"),
+    ("INSERT INTO tx_rollup (username, month) SELECT username, month FROM transactions", "insert tx_rollup"),
+    ("INSERT OR REPLACE INTO main.users SELECT * FROM src.users", "insert users"),
+    ("UPDATE transactions SET type=?, amount=? WHERE id=?", "update transactions"),
+    ("UPDATE transactions SET version = (SELECT version FROM data_versions d) WHERE version IS NULL",
+     "update transactions"),
+    ("UPDATE OR IGNORE user_stats SET total = 0", "update user_stats"),
+    ("DELETE FROM tx_rollup WHERE username = ? AND count <= 0", "delete tx_rollup"),
+    ("DELETE FROM transactions WHERE id IN (SELECT id FROM tx_tombstones)", "delete transactions"),
+    ("REPLACE INTO exchange_rates VALUES (?, ?, ?, ?)", "replace exchange_rates"),
+    ("BEGIN IMMEDIATE", "begin"),
+    ("COMMIT", "commit"),
+    ("  ", "empty"),
+])
+def test_statement_label(sql, label):
+    assert metrics.statement_label(sql) == label
@@ -0,0 +1,10 @@
+"""Every hot query in bench.HOT_QUERIES is served by its index without a temp sort."""
+import pytest
+
+import bench
+
+
+@pytest.mark.parametrize("position", range(len(bench.HOT_QUERIES)))
+def test_hot_query_uses_its_index(fresh_db, position):
+    ok, index, plan = bench.check_plans()[position]
+    assert ok, f"{index} not used: {' | '.join(plan)}"
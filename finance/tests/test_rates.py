@@ -0,0 +1,94 @@
+"""RateCache against bench.StubYahoo: single-flight, TTL, stale-while-revalidate, warm start."""
+import asyncio
+
+import pytest
+
+import http_client
+import rates
+from bench import StubYahoo
+
+
+@pytest.fixture
+def stub(monkeypatch, fresh_db):
+    with StubYahoo() as stub:
+        monkeypatch.setattr(rates, "RATES_UPSTREAM", stub.url)
+        yield stub
+
+def run(coro):
+    async def main():
+        try:
+            # Fails the test instead of hanging it if a fetch is never released
+            return await asyncio.wait_for(coro, timeout=10)
+        finally:
+            await http_client.close()
+    return asyncio.run(main())
+
+def gated(gate: asyncio.Event):
+    """The Yahoo fetch, held until `gate` is set: the test decides when upstream answers."""
+    async def fetch(frm: str, to: str) -> float:
+        await gate.wait()
+        return await rates.fetch_yahoo_rate(frm, to)
+    return fetch
+
+def stub_rate(symbol: str) -> float:
+    return round(1 + (sum(map(ord, symbol)) % 997) / 1000, 4)
+
+
+def test_concurrent_cold_requests_share_one_fetch(stub):
+    async def scenario():
+        gate = asyncio.Event()
+        cache = rates.RateCache(gated(gate), ttl=60, stale=60)
+        waiters = asyncio.gather(*(cache.get("EUR", "USD") for _ in range(20)))
+        # Every request is now waiting on the upstream
+        await asyncio.sleep(0)
+        gate.set()
+        return await waiters
+
+    results = run(scenario())
+    assert stub.hits == 1
+    assert {r["rate"] for r in results} == {stub_rate("EURUSD")}
+    assert not any(r["stale"] for r in results)
+
+def test_stale_value_is_served_while_refreshing(stub):
+    async def scenario():
+        gate = asyncio.Event()
+        gate.set()
+        # ttl=0: every cached value is already stale, but within the stale window
+        cache = rates.RateCache(gated(gate), ttl=0, stale=60)
+        first = await cache.get("EUR", "USD")
+        gate.clear()
+        # Answered from memory while the refresh is held at the gate
+        stale = await cache.get("EUR", "USD")
+        hits_during_refresh = stub.hits
+        refresh = cache._inflight["EURUSD"]
+        gate.set()
+        fresh_entry = await refresh
+        return first, stale, hits_during_refresh, fresh_entry
+
+    first, stale, hits_during_refresh, fresh_entry = run(scenario())
+    assert stale["stale"] and stale["rate"] == first["rate"]
+    assert hits_during_refresh == 1
+    assert stub.hits == 2
+    assert fresh_entry[1] > first["fetched_at"]
+
+def test_expired_value_is_fetched_again(stub):
+    # ttl=0, stale=0: the cached value is unusable as soon as it is stored
+    cache = rates.RateCache(rates.fetch_yahoo_rate, ttl=0, stale=0)
+
+    async def scenario():
+        await cache.get("EUR", "USD")
+        return await cache.get("EUR", "USD")
+
+    result = run(scenario())
+    assert not result["stale"]
+    assert stub.hits == 2
+
+def test_warm_start_from_exchange_rates(stub):
+    run(rates.RateCache(rates.fetch_yahoo_rate, ttl=60, stale=60).get("GBP", "USD"))
+    assert stub.hits == 1
+
+    restarted = rates.RateCache(rates.fetch_yahoo_rate, ttl=60, stale=60)
+    restarted.load()
+    result = run(restarted.get("GBP", "USD"))
+    assert stub.hits == 1
+    assert result["rate"] == stub_rate("GBPUSD") and not result["stale"]
@@ -0,0 +1,98 @@
+"""Per-user sharding: cross-shard admin listing, layout check on startup, reshard."""
+import zlib
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_at(monkeypatch, tmp_path):
+    """db_at(shards) switches the database to `shards` files under tmp_path, like a restart would."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "finance.db"))
+
+    def db_at(shards: int):
+        database.close_connections()
+        monkeypatch.setattr(database, "DB_SHARDS", shards)
+        return database
+    yield db_at
+    database.close_connections()
+
+def users_on_each_shard(count: int = 6) -> list:
+    """Usernames spread over both files of a two-shard layout (database.shard_of)."""
+    names = [f"user{i}" for i in range(count)]
+    assert {zlib.crc32(name.encode()) % 2 for name in names} == {0, 1}
+    return names
+
+
+def test_admin_users_fans_out_across_shards(db_at, monkeypatch):
+    db = db_at(2)
+    db.init_db()
+    names = users_on_each_shard()
+    for i, name in enumerate(names):
+        assert db.register_user(name, "pw")
+        db.add_transaction(name, "income", "Pay", 100.0 * (i + 1), "2024-05-01")
+        db.add_transaction(name, "expense", "Food", 10.0, "2024-05-02")
+    for index, path in enumerate(db.shard_paths()):
+        with db._db(path=path) as conn:
+            stored = {row[0] for row in conn.execute("SELECT username FROM users")}
+        assert stored == {name for name in names if db.shard_of(name) == index}
+
+    import api
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "admin")
+    import api_client
+    client = api_client.InProcessSession()
+    try:
+        assert client.request("GET", "/admin/users").status_code == 403
+        r = client.request("GET", "/admin/users", headers={"X-Admin-Token": "admin"})
+    finally:
+        client.close()
+    assert r.status_code == 200
+    body = r.json()
+    assert body["shards"] == 2
+    assert body["users"] == [
+        {"username": name, "transactions": 2, "balance": 100.0 * (i + 1) - 10.0} for i, name in enumerate(names)
+    ]
+
+def test_changing_shard_count_without_reshard_refuses_to_start(db_at):
+    db = db_at(2)
+    db.init_db()
+    db.register_user("ann", "pw")
+    with pytest.raises(RuntimeError, match="laid out for 2 shard"):
+        db_at(3).init_db()
+    with pytest.raises(RuntimeError, match="laid out for 2 shard"):
+        db_at(0).init_db()
+    db_at(2).init_db()
+
+def test_unrecorded_unsharded_database_is_detected(db_at):
+    db = db_at(0)
+    db.init_db()
+    db.register_user("ann", "pw")
+    # As written before layouts were recorded
+    with db._db(write=True) as conn:
+        conn.execute("DELETE FROM metadata")
+    with pytest.raises(RuntimeError, match="laid out for 1 shard"):
+        db_at(2).init_db()
+
+def test_reshard_moves_users_to_their_shard(db_at):
+    db = db_at(0)
+    db.init_db()
+    names = users_on_each_shard()
+    for name in names:
+        db.register_user(name, "pw")
+        db.add_transaction(name, "expense", "Food", 12.5, "2024-05-01")
+    before = db.list_users()
+
+    db = db_at(2)
+    with pytest.raises(RuntimeError):
+        db.init_db()
+    copied = db.reshard()
+    assert sum(copied.values()) == len(names)
+    db.init_db()
+    assert db.list_users() == before
+    for name in names:
+        assert db.authenticate_user(name, "pw")
+        assert db.get_summary(name)["totals"]["count"] == 1
+        # Already taken on its shard
+        assert not db.register_user(name, "other")
+    assert db.reshard() == {}
@@ -0,0 +1,17 @@
+"""Transaction writes through the API: date validation on create and update."""
+import pytest
+
+import database
+
+
+@pytest.mark.parametrize("date", ["2024-13-45", "2024-02-30", "2023-02-29", "2024-5-1", "yesterday"])
+def test_impossible_dates_are_rejected(client, login, date):
+    headers = login("ann")
+    tx = {"type": "expense", "category": "Food", "amount": 5.0}
+    r = client.request("POST", "/transactions", headers=headers, json={**tx, "date": date})
+    assert r.status_code == 422
+
+    tx_id = client.request("POST", "/transactions", headers=headers, json={**tx, "date": "2024-02-29"}).json()["id"]
+    r = client.request("PUT", f"/transactions/{tx_id}", headers=headers, json={**tx, "date": date})
+    assert r.status_code == 422
+    assert [row["month"] for row in database.get_summary("ann")["by_month"]] == ["2024-02"]
@@ -0,0 +1,140 @@
+"""Write-behind group commit: savepoint isolation, durable=False, writer failures."""
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def writer(monkeypatch, fresh_db):
+    """The group writer for the fresh database, held busy until the returned release() is called."""
+    monkeypatch.setattr(database, "WRITE_BEHIND", True)
+    monkeypatch.setattr(database, "WRITER_CHECK_SECONDS", 0.05)
+    started, gate = threading.Event(), threading.Event()
+
+    def busy(conn):
+        started.set()
+        gate.wait(10)
+
+    writer = database._writer(database.DB_PATH)
+    # Ops submitted while this one runs queue up and form the next group together
+    busy = writer.submit(busy, ())
+    assert started.wait(10)
+    yield writer, gate.set
+    gate.set()
+    busy.committed.wait(10)
+    database.stop_writers()
+
+def visible_amounts() -> list:
+    # Read on this thread's own connection: only committed rows
+    with database._db() as conn:
+        return [row[0] for row in conn.execute("SELECT amount FROM transactions ORDER BY id")]
+
+def run_in_thread(fn, *args, **kwargs) -> dict:
+    out = {}
+
+    def target():
+        try:
+            out["result"] = fn(*args, **kwargs)
+        except BaseException as e:
+            out["error"] = e
+    thread = threading.Thread(target=target)
+    thread.start()
+    out["thread"] = thread
+    return out
+
+
+def test_failing_op_does_not_roll_back_its_group(writer):
+    writer, release = writer
+    ops = [
+        writer.submit(database._insert_user, ("ann", "pw")),
+        writer.submit(database._insert_user, ("bob", "pw")),
+        writer.submit(database._insert_user, ("ann", "again")),
+        writer.submit(database._insert_transaction, ("bob", "expense", "Food", 5.0, "2024-05-01")),
+    ]
+    release()
+    for op in ops:
+        assert op.committed.wait(10)
+    assert [op.error for op in ops[:2] + ops[3:]] == [None, None, None]
+    assert isinstance(ops[2].error, sqlite3.IntegrityError)
+    assert database.get_password("bob") == "pw"
+    assert database.get_password("ann") == "pw"
+    assert visible_amounts() == [5.0]
+
+def test_non_durable_write_returns_before_the_commit(writer):
+    writer, release = writer
+    call = run_in_thread(database.add_transaction, "ann", "expense", "Food", 7.0, "2024-05-01", durable=False)
+    while writer.queue.empty():
+        call["thread"].join(0.001)
+    # Same group, after the write: holds the commit back until released
+    hold = threading.Event()
+    held = writer.submit(lambda conn: hold.wait(10), ())
+    release()
+    call["thread"].join(10)
+    assert isinstance(call["result"], int)
+    assert visible_amounts() == []
+    hold.set()
+    assert held.committed.wait(10)
+    assert visible_amounts() == [7.0]
+
+def test_writer_that_cannot_open_its_database_fails_writes(monkeypatch, fresh_db):
+    monkeypatch.setattr(database, "WRITE_BEHIND", True)
+    monkeypatch.setattr(database, "WRITER_CHECK_SECONDS", 0.05)
+    real_open = database._open
+
+    def broken_open(path):
+        if threading.current_thread().name.startswith("db-writer"):
+            raise sqlite3.OperationalError("unable to open database file")
+        return real_open(path)
+
+    monkeypatch.setattr(database, "_open", broken_open)
+    for _ in range(2):
+        call = run_in_thread(database.add_transaction, "ann", "expense", "Food", 1.0, "2024-05-01")
+        call["thread"].join(10)
+        assert not call["thread"].is_alive()
+        assert isinstance(call["error"], (sqlite3.OperationalError, RuntimeError))
+
+    # A dead writer is replaced by the next write
+    monkeypatch.setattr(database, "_open", real_open)
+    assert database.add_transaction("ann", "expense", "Food", 2.0, "2024-05-01")
+    assert visible_amounts() == [2.0]
+    database.stop_writers()
+
+def test_failed_rollback_fails_the_group_and_replaces_the_writer(monkeypatch, fresh_db):
+    monkeypatch.setattr(database, "WRITE_BEHIND", True)
+    monkeypatch.setattr(database, "WRITER_CHECK_SECONDS", 0.05)
+    real_open = database._open
+
+    class BrokenConn:
+        """A writer connection whose COMMIT and ROLLBACK both fail."""
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+        def execute(self, sql, *args):
+            if sql in ("COMMIT", "ROLLBACK"):
+                raise sqlite3.OperationalError("disk I/O error")
+            return self.conn.execute(sql, *args)
+
+    def broken_open(path):
+        conn = real_open(path)
+        return BrokenConn(conn) if threading.current_thread().name.startswith("db-writer") else conn
+
+    monkeypatch.setattr(database, "_open", broken_open)
+    call = run_in_thread(database.add_transaction, "ann", "expense", "Food", 1.0, "2024-05-01")
+    call["thread"].join(10)
+    assert not call["thread"].is_alive()
+    assert isinstance(call["error"], sqlite3.OperationalError)
+    dead = database._writers[database.DB_PATH]
+    dead.join(10)
+    assert not dead.is_alive()
+
+    monkeypatch.setattr(database, "_open", real_open)
+    assert database.add_transaction("ann", "expense", "Food", 2.0, "2024-05-01")
+    assert database._writers[database.DB_PATH] is not dead
+    assert visible_amounts() == [2.0]
+    database.stop_writers()
@@ -1,17 +1,50 @@
 import streamlit as st
-import requests
 import os
+import threading
+import time
+from collections import OrderedDict, deque
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dotenv import load_dotenv
 
+import api_client
+
 load_dotenv()
 
 API_HOST = os.getenv("API_HOST", "http://127.0.0.1:8000")
 
 st.set_page_config(page_title="Finance Tracker", layout="wide")
 
+# --- API client ---
+# One client per Streamlit process, shared by every rerun and user (see
+# api_client.py). FINANCE_TRANSPORT=http (default) keeps pooled keep-alive
+# connections to API_HOST with retries for idempotent calls; inprocess runs
+# the API inside this process and skips the network hop.
+FINANCE_TRANSPORT = os.getenv("FINANCE_TRANSPORT", "http")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "8"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+SLOW_API_MS = float(os.getenv("SLOW_API_MS", "300"))
+
+@st.cache_resource
+def _api_session():
+    return api_client.session(FINANCE_TRANSPORT, API_RETRIES, API_POOL_SIZE)
+
+def api_call(method, path, **kwargs):
+    """Request `path` on the API through the shared session, timing it for the debug panel."""
+    kwargs.setdefault("timeout", API_TIMEOUT)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        r = _api_session().request(method, f"{API_HOST}{path}", **kwargs)
+        status = r.status_code
+        return r
+    finally:
+        calls = st.session_state.setdefault("api_calls", deque(maxlen=50))
+        calls.append({"method": method, "path": path, "status": status,
+                      "ms": round((time.perf_counter() - start) * 1000, 1), "at": time.strftime("%H:%M:%S")})
+
 # --- Session Helpers ---
 def set_token(token: str, username: str):
     st.session_state["token"] = token
@@ -25,7 +58,7 @@ def get_username():
 
 def clear_session():
     # Clean up all session state
-    keys_to_delete = ["token", "username", "tx_tab"]
+    keys_to_delete = ["token", "username", "tx_tab", "history"]
     for k in keys_to_delete:
         if k in st.session_state:
             del st.session_state[k]
@@ -52,7 +85,7 @@ if not get_token():
             
         if submitted_login:
             try:
-                r = requests.post(f"{API_HOST}/auth/login", json={"username": lu, "password": lp}, timeout=8)
+                r = api_call("POST", "/auth/login", json={"username": lu, "password": lp})
                 if r.status_code == 200:
                     token = r.json().get("access_token")
                     if token:
@@ -75,7 +108,7 @@ if not get_token():
             
         if submitted_signup:
             try:
-                r = requests.post(f"{API_HOST}/auth/register", json={"username": su, "password": sp}, timeout=8)
+                r = api_call("POST", "/auth/register", json={"username": su, "password": sp})
                 if r.status_code in (200, 201):
                     st.success("Account created! Please log in.")
                 else:
@@ -97,41 +130,193 @@ if "tx_tab" not in st.session_state:
 
 menu = st.sidebar.radio("Navigate", ["Home", "Transactions", "Budget Goals", "Currency Converter", "Logout"])
 
-# Helper function to fetch transactions
-@st.cache_data(ttl=60) 
-def fetch_transactions(token):
+# --- Conditional GETs ---
+# Last (ETag, parsed body) per token + URL, shared by every session of this
+# Streamlit process. Keyed by token, so users never see each other's data.
+ETAG_STORE_SIZE = 512
+
+@st.cache_resource
+def _etag_store():
+    return OrderedDict(), threading.Lock()
+
+def get_revalidated(token, path, params=None, parse=None):
+    """
+    GET `path` with If-None-Match from the last response. On 304 the stored
+    body is reused, so an unchanged resource costs one empty round-trip.
+    Returns None on errors.
+    """
+    store, lock = _etag_store()
+    key = (token, path, tuple(sorted((params or {}).items())))
+    headers = {"Authorization": f"Bearer {token}"}
+    with lock:
+        cached = store.get(key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    try:
+        r = api_call("GET", path, params=params, headers=headers)
+    except Exception as e:
+        return None
+    if r.status_code == 304 and cached:
+        with lock:
+            store.move_to_end(key)
+        return cached[1]
+    if r.status_code != 200:
+        return None
+    value = parse(r) if parse else r.json()
+    etag = r.headers.get("ETag")
+    if etag:
+        with lock:
+            store[key] = (etag, value)
+            store.move_to_end(key)
+            while len(store) > ETAG_STORE_SIZE:
+                store.popitem(last=False)
+    return value
+
+# --- Per-user cache keys ---
+# Cached fetchers take the user's revision as an argument. A write bumps only
+# that user's revision, so everyone else's cached entries stay valid; the
+# writer's old entries are no longer hit and expire on their own.
+@st.cache_resource
+def _user_revisions():
+    return {}, threading.Lock()
+
+def user_revision(user):
+    revisions, _ = _user_revisions()
+    return revisions.get(user, 0)
+
+def invalidate_user(user):
+    revisions, lock = _user_revisions()
+    with lock:
+        revisions[user] = revisions.get(user, 0) + 1
+
+# Everything one page shows (goal, totals, categories, series, tips) in one request
+@st.cache_data(ttl=60)
+def fetch_dashboard(token, revision=0, period="all"):
     if not token:
         return None
-    headers = {"Authorization": f"Bearer {token}"}
+    params = {"period": period}
+    if period != "all":
+        # Explicit month, so the ETag changes when the month does
+        params["month"] = pd.Timestamp.now().strftime("%Y-%m")
+    return get_revalidated(token, "/me/dashboard", params)
+
+# Balance/income/expense lines, bucketed and downsampled server-side, so a long
+# history still sends a few hundred points per line to the browser
+SERIES_POINTS = 400
+
+@st.cache_data(ttl=60)
+def fetch_series(token, revision=0, bucket="week"):
+    if not token:
+        return None
+    return get_revalidated(token, "/me/series", {"bucket": bucket, "points": SERIES_POINTS})
+
+# Whole rate table in one call; any pair is derived from it locally.
+# st.cache_data does not cache exceptions, so failures and incomplete tables
+# are raised out of the cached function and retried on the next conversion
+class IncompleteRates(Exception):
+    def __init__(self, table):
+        super().__init__(f"missing quotes: {', '.join(table['missing'])}")
+        self.table = table
+
+@st.cache_data(ttl=300)
+def _cached_rate_table(symbols):
+    r = api_call("GET", "/rates", params={"base": "USD", "symbols": ",".join(symbols)}, timeout=15)
+    r.raise_for_status()
+    table = r.json()
+    if table["missing"]:
+        raise IncompleteRates(table)
+    return table
+
+def fetch_rate_table(symbols):
     try:
-        r = requests.get(f"{API_HOST}/transactions/me", headers=headers, timeout=8)
-        if r.status_code == 200:
-            return r.json()
-        else:
-            return None
+        return _cached_rate_table(symbols)
+    except IncompleteRates as e:
+        return e.table  # usable for the pairs it has, but not kept
     except Exception as e:
         return None
 
+HISTORY_PAGE_SIZE = 50
+
+# --- Delta sync ---
+# Each user's transactions are kept in this process together with the change
+# version they are current to. A refresh asks /transactions/changes for what
+# happened since that version only, so after the first load a heavy user's
+# history costs a few rows per rerun instead of a full reload. The store is
+# bounded by rows, not users: least recently synced users are dropped once
+# it holds more than TX_STORE_ROWS (the user being served is always kept).
+TX_STORE_ROWS = int(os.getenv("TX_STORE_ROWS", "200000"))
+
+@st.cache_resource
+def _tx_store():
+    return OrderedDict(), threading.Lock()
+
+def sync_transactions(token, user):
+    """The user's transactions, newest first, brought up to date with one delta request."""
+    store, lock = _tx_store()
+    with lock:
+        entry = store.get(user)
+        if entry is None:
+            entry = store[user] = {"version": 0, "rows": {}, "sorted": [], "lock": threading.Lock()}
+        store.move_to_end(user)
+    with entry["lock"]:
+        try:
+            r = api_call("GET", "/transactions/changes", params={"since": entry["version"]},
+                         headers={"Authorization": f"Bearer {token}"}, timeout=30)
+            delta = r.json() if r.status_code == 200 else None
+        except Exception as e:
+            delta = None  # keep showing what we have
+        # Version 0 is the first load: apply it even when the server has no data version yet
+        if delta and (delta["reset"] or entry["version"] == 0 or delta["version"] != entry["version"]):
+            rows = {} if delta["reset"] or entry["version"] == 0 else entry["rows"]
+            for row in delta["upserts"]:
+                rows[row["id"]] = row
+            for tx_id in delta["deleted"]:
+                rows.pop(tx_id, None)
+            entry["rows"] = rows
+            entry["sorted"] = sorted(rows.values(), key=lambda row: (row["date"], row["id"]), reverse=True)
+            entry["version"] = delta["version"]
+            with lock:
+                _evict_rows(store, keep=user)
+        return entry["sorted"]
+
+def _evict_rows(store, keep):
+    total = sum(len(entry["rows"]) for entry in store.values())
+    for user in list(store):
+        if total <= TX_STORE_ROWS:
+            break
+        if user != keep:
+            total -= len(store.pop(user)["rows"])
+
+def filter_history(rows, filters):
+    f = dict(filters)
+    return [
+        row for row in rows
+        if ("type" not in f or row["type"] == f["type"])
+        and ("category" not in f or row["category"] == f["category"])
+        and ("from" not in f or row["date"] >= f["from"])
+        and ("to" not in f or row["date"] <= f["to"])
+    ]
+
 # 1. HOME PAGE
 if menu == "Home":
     st.title("🏠 Welcome Back!")
     st.markdown(f"Hello **{username}**, here is your financial overview.")
     
-    txs = fetch_transactions(get_token())
+    summary = fetch_dashboard(get_token(), user_revision(username))
     
-    if txs:
-        df = pd.DataFrame(txs)
-        df["amount"] = df["amount"].astype(float)
-        
-        total_income = df[df["type"] == "income"]["amount"].sum()
-        total_expense = df[df["type"] == "expense"]["amount"].sum()
-        balance = total_income - total_expense
+    if summary and summary["totals"]["count"]:
+        total_income = summary["totals"]["income"]
+        total_expense = summary["totals"]["expense"]
+        balance = summary["totals"]["balance"]
         
         c1, c2, c3 = st.columns(3)
         c1.metric("Total Balance", f"${balance:,.2f}", delta=f"${balance:,.2f}")
         c2.metric("Total Income", f"${total_income:,.2f}", delta_color="normal")
         c3.metric("Total Expenses", f"${total_expense:,.2f}", delta_color="inverse")
         
+        for tip in summary["tips"]:
+            st.write(tip)
+        
         st.info("👉 Use the sidebar to navigate to **Transactions** to manage your money or **Budget Goals** to track targets.")
     else:
         st.warning("No transaction data found.")
@@ -140,9 +325,6 @@ if menu == "Home":
 elif menu == "Transactions":
     st.title("💳 Manage Transactions")
     
-    txs = fetch_transactions(get_token())
-    df = pd.DataFrame(txs) if txs else pd.DataFrame()
-    
     # Use Radio Button for Tabs to persist state
     tx_tab = st.radio("Select Action", ["Add New", "Charts", "History & Edit"], horizontal=True, label_visibility="collapsed")
 
@@ -161,20 +343,19 @@ elif menu == "Transactions":
             if submitted:
                 headers = auth_headers()
                 try:
-                    r = requests.post(
-                        f"{API_HOST}/transactions", 
+                    r = api_call(
+                        "POST", "/transactions",
                         json={
                             "type": ttype, 
                             "category": category or "Misc", 
                             "amount": float(amount), 
                             "date": date.strftime("%Y-%m-%d")
                         }, 
-                        headers=headers, 
-                        timeout=8
+                        headers=headers
                     )
                     if r.status_code == 200:
                         st.success("Transaction added successfully!")
-                        st.cache_data.clear()
+                        invalidate_user(username)
                         st.rerun()
                     else:
                         err = r.json().get("detail", r.text)
@@ -183,33 +364,74 @@ elif menu == "Transactions":
                     st.error(f"API Error: {e}")
 
     elif tx_tab == "Charts":
-        if not df.empty:
+        summary = fetch_dashboard(get_token(), user_revision(username))
+        if summary and summary["totals"]["count"]:
             st.subheader("Financial Breakdown")
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("**Income vs Expense**")
-                inc_exp = df.groupby("type")["amount"].sum().reset_index()
+                inc_exp = pd.DataFrame([
+                    {"type": "income", "amount": summary["totals"]["income"]},
+                    {"type": "expense", "amount": summary["totals"]["expense"]},
+                ])
                 fig_pie = px.pie(inc_exp, values="amount", names="type", hole=0.5, 
                                  color_discrete_map={"income": "#00cc96", "expense": "#ef553b"})
                 st.plotly_chart(fig_pie, use_container_width=True)
             
             with col2:
                 st.write("**Expenses by Category**")
-                expenses = df[df["type"] == "expense"]
-                if not expenses.empty:
-                    cat_data = expenses.groupby("category")["amount"].sum().reset_index().sort_values("amount", ascending=False)
+                expenses = [c for c in summary["by_category"] if c["type"] == "expense"]
+                if expenses:
+                    cat_data = pd.DataFrame(expenses).rename(columns={"total": "amount"})
                     fig_bar = px.bar(cat_data, x="category", y="amount", color="amount", 
                                      color_continuous_scale="Reds")
                     st.plotly_chart(fig_bar, use_container_width=True)
                 else:
                     st.info("No expenses recorded yet.")
+
+            st.subheader("Over Time")
+            bucket = st.radio("Group by", ["day", "week", "month"], index=1, horizontal=True, key="series_bucket")
+            data = fetch_series(get_token(), user_revision(username), bucket)
+            if data and data["buckets"]:
+                fig_line = go.Figure()
+                for line, color in (("balance", "#636efa"), ("income", "#00cc96"), ("expense", "#ef553b")):
+                    points = data["series"][line]
+                    fig_line.add_trace(go.Scattergl(x=points["x"], y=points["y"], name=line.title(),
+                                                    mode="lines", line={"color": color}))
+                fig_line.update_layout(hovermode="x unified", margin={"t": 10})
+                st.plotly_chart(fig_line, use_container_width=True)
+                if data["buckets"] > SERIES_POINTS:
+                    st.caption(f"{data['buckets']:,} {bucket}s, downsampled to {SERIES_POINTS} points per line.")
         else:
             st.info("Add transactions to see charts here.")
 
     elif tx_tab == "History & Edit":
+        f1, f2, f3, f4 = st.columns(4)
+        f_type = f1.selectbox("Type", ["All", "income", "expense"], key="hist_type")
+        f_category = f2.text_input("Category", key="hist_category")
+        f_from = f3.date_input("From", value=None, key="hist_from")
+        f_to = f4.date_input("To", value=None, key="hist_to")
+        filters = []
+        if f_type != "All":
+            filters.append(("type", f_type))
+        if f_category:
+            filters.append(("category", f_category))
+        if f_from:
+            filters.append(("from", f_from.strftime("%Y-%m-%d")))
+        if f_to:
+            filters.append(("to", f_to.strftime("%Y-%m-%d")))
+
+        rows = filter_history(sync_transactions(get_token(), username), tuple(filters))
+        state = st.session_state.get("history")
+        if not state or state["filters"] != filters:
+            state = st.session_state["history"] = {"filters": filters, "shown": HISTORY_PAGE_SIZE}
+        df = pd.DataFrame(rows[:state["shown"]])
         if not df.empty:
-            st.dataframe(df.sort_values(by="date", ascending=False), use_container_width=True)
+            st.dataframe(df, use_container_width=True)
+            if len(rows) > state["shown"] and st.button("Load more"):
+                state["shown"] += HISTORY_PAGE_SIZE
+                st.rerun()
             
             st.markdown("---")
             col_edit, col_del = st.columns(2)
@@ -241,10 +463,10 @@ elif menu == "Transactions":
                                 "date": edit_date.strftime("%Y-%m-%d")
                             }
                             try:
-                                r = requests.put(f"{API_HOST}/transactions/{tx_id}", json=payload, headers=auth_headers(), timeout=8)
+                                r = api_call("PUT", f"/transactions/{tx_id}", json=payload, headers=auth_headers())
                                 if r.status_code == 200:
                                     st.success("Transaction updated!")
-                                    st.cache_data.clear()
+                                    invalidate_user(username)
                                     st.rerun()
                                 else:
                                     st.error(f"Update failed: {r.json().get('detail', 'Unknown error')}")
@@ -257,10 +479,10 @@ elif menu == "Transactions":
                 if st.button("Delete Selected", type="secondary"):
                     if sel_del:
                         try:
-                            r = requests.delete(f"{API_HOST}/transactions/{sel_del}", headers=auth_headers(), timeout=8)
+                            r = api_call("DELETE", f"/transactions/{sel_del}", headers=auth_headers())
                             if r.status_code == 200:
                                 st.success("Transaction deleted!")
-                                st.cache_data.clear()
+                                invalidate_user(username)
                                 st.rerun()
                             else:
                                 st.error("Failed to delete.")
@@ -273,15 +495,9 @@ elif menu == "Transactions":
 elif menu == "Budget Goals":
     st.title("🎯 Budget Goals & Progress")
     
-    # 1. Fetch the existing goal from the Database
-    try:
-        r = requests.get(f"{API_HOST}/me/goal", headers=auth_headers(), timeout=8)
-        if r.status_code == 200:
-            current_goal_value = r.json().get("goal", 1000.0)
-        else:
-            current_goal_value = 1000.0
-    except:
-        current_goal_value = 1000.0
+    # 1. Fetch the existing goal and this month's figures in one request
+    summary = fetch_dashboard(get_token(), user_revision(username), "month")
+    current_goal_value = summary["goal"] if summary else 1000.0
 
     # 2. Display the input field pre-filled with the DB value
     with st.expander("Set your Savings Goal", expanded=True):
@@ -290,39 +506,30 @@ elif menu == "Budget Goals":
         # 3. When clicked, send the NEW value to the Database
         if st.button("Update Goal"):
             try:
-                r = requests.put(f"{API_HOST}/me/goal", json={"amount": float(new_goal)}, headers=auth_headers(), timeout=8)
+                r = api_call("PUT", "/me/goal", json={"amount": float(new_goal)}, headers=auth_headers())
                 if r.status_code == 200:
                     st.success("Goal saved to database!")
+                    invalidate_user(username)
                     st.rerun() # Refresh to show the new saved value
                 else:
                     st.error("Failed to save goal.")
             except Exception as e:
                 st.error(f"Error: {e}")
 
-    # Fetch Data for Charts
-    txs = fetch_transactions(get_token())
-    
     # Use the value we just fetched from DB for the chart
     goal = current_goal_value
 
-    if txs:
-        df = pd.DataFrame(txs)
-        df["date"] = pd.to_datetime(df["date"])
-        df["amount"] = df["amount"].astype(float)
-        
-        now = pd.Timestamp.now()
-        current_month_data = df[(df["date"].dt.month == now.month) & (df["date"].dt.year == now.year)]
-        
-        if current_month_data.empty:
+    if summary and summary["all_time"]["count"]:
+        if not summary["totals"]["count"]:
             st.warning("No transactions for **this month** yet. Showing all-time progress.")
-            data_source = df
+            data_source = summary["all_time"]
             period_label = "(All Time)"
         else:
-            data_source = current_month_data
+            data_source = summary["totals"]
             period_label = "(This Month)"
 
-        income = data_source[data_source["type"] == "income"]["amount"].sum()
-        expenses = data_source[data_source["type"] == "expense"]["amount"].sum()
+        income = data_source["income"]
+        expenses = data_source["expense"]
         current_savings = income - expenses
         
         m1, m2, m3 = st.columns(3)
@@ -392,15 +599,17 @@ elif menu == "Currency Converter":
     
     if st.button("Convert", use_container_width=True):
         try:
-            r = requests.get(f"{API_HOST}/scrape-currency", params={"frm": frm, "to": to}, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                rate = float(data.get("rate"))
+            table = fetch_rate_table(tuple(currencies))
+            if table is None:
+                st.error("Failed to fetch rates.")
+            elif frm in table["rates"] and to in table["rates"]:
+                # Every pair comes from the same table: units per 1 USD
+                rate = table["rates"][to] / table["rates"][frm]
                 res = amt * rate
-                st.success(f"Exchange Rate (Source: {data.get('source')}): 1 {frm} = {rate} {to}")
+                st.success(f"Exchange Rate (Source: Yahoo Finance): 1 {frm} = {rate:,.6g} {to}")
                 st.metric(f"{amt} {frm}", f"{res:,.4f} {to}")
-                if "note" in data:
-                    st.caption(f"Note: {data['note']}")
+                if table.get("as_of"):
+                    st.caption(f"Rates as of {table['as_of']}")
             else:
                 st.error("Failed to fetch rate. The currency pair might not exist on Yahoo Finance.")
         except Exception as e:
@@ -409,6 +618,18 @@ elif menu == "Currency Converter":
 # 5. LOGOUT
 elif menu == "Logout":
     clear_session()
-    st.cache_data.clear()
+    invalidate_user(username)
     st.success("Logged out successfully.")
-    st.rerun()
\ No newline at end of file
+    st.rerun()
+# --- API debug panel ---
+# Rendered last so it includes this rerun's calls
+with st.sidebar.expander("API calls", expanded=False):
+    calls = list(st.session_state.get("api_calls", ()))[::-1]
+    if calls:
+        df_calls = pd.DataFrame(calls)
+        slow = df_calls[df_calls["ms"] > SLOW_API_MS]
+        st.caption(f"Last {len(calls)} calls over {FINANCE_TRANSPORT}, newest first; "
+                   f"{len(slow)} over {SLOW_API_MS:.0f} ms")
+        st.dataframe(df_calls[["at", "method", "path", "status", "ms"]], hide_index=True, use_container_width=True)
+    else:
+        st.caption("No API calls yet.")